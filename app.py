@@ -0,0 +1,307 @@
+import streamlit as st
+import functools
+import os
+import time
+from dotenv import load_dotenv
+
+# The common modules read their settings when imported, so .env goes first
+load_dotenv()
+
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from common.conversation_store import ChatMessage, Conversation, create_conversation_store
+from common.dispatch import DispatcherBusy, TurnDispatcher
+from common.history import render_history
+from common.logs import get_logger
+from common.metrics import REPLY_PICKUP_SECONDS, RERUN_SECONDS, start_metrics_export
+from common.prefetch import PREFETCH_OPTIONS, OptionPrefetcher
+from common.replies import parse_reply
+from common.response_cache import ResponseCache
+from common.sessions import SessionRegistry, wake_session
+from common.stories import CHAT_STORIES, story_label, story_states, switch_story
+from common.streaming import PENDING_POLL_INTERVAL, STREAM_FLUSH_INTERVAL, STREAM_RESPONSES
+from common.transports import create_transport
+
+logger = get_logger("app")
+
+# --- INITIAL SCRIPT START ---
+# Stopped at the end of the script, or by rerun() when the run ends early
+rerun_timer = RERUN_SECONDS.time()
+
+st.set_page_config(page_title="Demo AI Chat")
+
+# --- Transport (shared by all sessions; see CHAT_TRANSPORT) ---
+# Only the chosen protocol's client library is imported
+@st.cache_resource
+def get_transport(name):
+    return create_transport(name)
+
+transport = get_transport(os.getenv("CHAT_TRANSPORT", "auto"))
+st.title(f"Buid with Streamlit and {transport.title}")
+
+# --- Metrics (shared by all sessions; see METRICS_PORT / METRICS_FILE) ---
+@st.cache_resource
+def get_metrics_exporter():
+    return start_metrics_export()
+
+get_metrics_exporter()
+
+# --- Session Registry (shared by all sessions; see SESSION_IDLE_TTL / SESSION_CLOSED_TTL) ---
+# Reclaims what idle and closed sessions hold, and counts sessions, threads and sockets
+@st.cache_resource
+def get_session_registry():
+    return SessionRegistry()
+
+def rerun():
+    # st.rerun() ends the script run early; record its duration first
+    rerun_timer.stop()
+    st.rerun()
+
+# --- Conversation Store (shared by all sessions; see CONVERSATION_STORE) ---
+@st.cache_resource
+def get_conversation_store():
+    return create_conversation_store()
+
+# --- Session State Setup ---
+if "session_id" not in st.session_state:
+    st.session_state.session_id = get_script_run_ctx().session_id
+if "story_id" not in st.session_state:
+    st.session_state.story_id = CHAT_STORIES[0]
+    st.session_state.stories = {}  # storyId -> parked state of the stories not shown (see CHAT_STORIES)
+story_id = st.session_state.story_id
+# Keyed by session and story; also orders the story's turns (see start_turn)
+conversation_key = f"{st.session_state.session_id}:{story_id}"
+# The state below belongs to the active story and is created when it is first opened
+if "messages" not in st.session_state:
+    # Only the newest messages stay in memory
+    st.session_state.messages = Conversation(get_conversation_store(), conversation_key)
+if "connected" not in st.session_state:
+    st.session_state.connected = False
+if "current_answer_options" not in st.session_state:
+    st.session_state.current_answer_options = []
+if "prefetched_replies" not in st.session_state:
+    st.session_state.prefetched_replies = {}  # option text -> Future of its reply
+if "pending_turn" not in st.session_state:
+    st.session_state.pending_turn = None  # Turn whose reply is still being fetched
+
+# --- Response Cache (shared by all sessions; opt-in with RESPONSE_CACHE) ---
+@st.cache_resource
+def get_response_cache():
+    return ResponseCache()
+
+# --- Option Prefetch (shared thread pool; opt-in with PREFETCH_OPTIONS) ---
+@st.cache_resource
+def get_prefetcher():
+    return OptionPrefetcher()
+
+def prefetch_answer_options(options):
+    # Options whose reply is already cached need no request
+    cache = get_response_cache()
+    keys = {o: cache.key_for(story_id, st.session_state.messages, o) for o in options}
+    missing = [o for o in options if keys[o] is None or not cache.contains(keys[o])]
+    fetch = functools.partial(transport.fetch_reply, story_id=story_id)
+    st.session_state.prefetched_replies = get_prefetcher().prefetch(fetch, missing)
+
+# --- Background Dispatch (shared worker pool; see DISPATCH_WORKERS) ---
+# Replies are fetched off the script thread, so a slow backend never blocks a
+# rerun. The session keeps the Turn in st.session_state.pending_turn; the
+# turn wakes the session when it is done, and show_pending_turn() polls it
+# as a fallback.
+@st.cache_resource
+def get_dispatcher():
+    return TurnDispatcher()
+
+# --- Start fetching the reply to a message; returns False if the dispatcher is full ---
+# With a `cache_key` (see get_response_cache), the complete reply is cached.
+# Turns of one story reach the backend in order; other stories' run alongside.
+# A `prefetch` Future still running for the message becomes the turn instead.
+def start_turn(message_content, cache_key=None, prefetch=None):
+    try:
+        if prefetch is not None:
+            turn = get_dispatcher().adopt(message_content, prefetch, cache_key)
+        else:
+            turn = transport.start_turn(
+                get_dispatcher(), message_content, cache_key, story_id=story_id, order_key=conversation_key
+            )
+    except DispatcherBusy:
+        st.error("The backend is busy with other requests. Please try again in a moment.")
+        return False
+    if turn is st.session_state.pending_turn:
+        # Double submit of the message still in flight: nothing new was sent
+        logger.info("Dropped duplicate of '%s'", message_content)
+        return False
+    if st.session_state.pending_turn is not None:
+        # A new message supersedes the reply still in flight
+        logger.info("Superseding reply to '%s'", st.session_state.pending_turn.message)
+        st.session_state.pending_turn.cancel()
+    st.session_state.pending_turn = turn
+    # Rerun only this session as soon as the reply is in, from whichever thread resolves it
+    session_id = st.session_state.session_id
+    turn.future.add_done_callback(lambda _: wake_session(session_id))
+    return True
+
+# --- Collect a finished turn's reply, or report its error ---
+def finish_turn(turn):
+    st.session_state.pending_turn = None
+    if turn.finished is not None:
+        REPLY_PICKUP_SECONDS.observe(time.monotonic() - turn.finished)
+    try:
+        data = turn.result()
+    except Exception as e:
+        logger.warning("Request for '%s' failed: %s", turn.message, e)
+        st.error(transport.error_message(e))
+        # A timeout or server error is reported but does not mean the backend is down
+        if transport.is_connection_error(e):
+            st.session_state.connected = False
+        return None
+    st.session_state.connected = True
+    name, text = turn.streamed()
+    if data is None and text:
+        # Stream ended without its final reply: keep what was received
+        return {"answers": [{"name": name, "message": text}]}
+    if data and turn.cache_key is not None:
+        get_response_cache().put(turn.cache_key, data)
+    return data
+
+# --- Pending indicator, redrawn while the reply streams in ---
+# Redrawn at the stream's flush rate only when there is streamed text to show;
+# otherwise a slow fallback in case the wake-up from start_turn did not arrive
+@st.fragment(run_every=STREAM_FLUSH_INTERVAL if STREAM_RESPONSES else PENDING_POLL_INTERVAL)
+def show_pending_turn():
+    turn = st.session_state.pending_turn
+    if turn is None or turn.done():
+        st.rerun()  # Full rerun, which processes the reply
+    # Everything streamed since the last redraw, in one batch
+    name, text = turn.streamed()
+    with st.chat_message(name):
+        st.markdown(text + "▌" if text else "Waiting for reply…")
+    if st.button("Cancel", key="cancel_turn"):
+        logger.info("Cancelled reply to '%s'", turn.message)
+        turn.cancel()
+        st.session_state.pending_turn = None
+        st.rerun()
+
+# --- Process a Reply ---
+def process_reply(data):
+    messages, options = parse_reply(data)
+    for message in messages:
+        st.session_state.messages.append(message)
+
+    # Reset options state before processing new ones
+    st.session_state.current_answer_options = options
+    OptionPrefetcher.discard(st.session_state.prefetched_replies)
+    rerun() # Rerun to update the UI with new messages/options
+
+
+# --- Story Switcher ---
+# Switching only swaps parked session state; nothing is refetched
+if len(CHAT_STORIES) > 1:
+    st.sidebar.radio(
+        "Story",
+        CHAT_STORIES,
+        index=CHAT_STORIES.index(story_id),
+        key="story_picker",
+        format_func=story_label,
+        on_change=lambda: switch_story(st.session_state.story_picker),
+    )
+
+
+# --- Connection Status ---
+# None for connectionless protocols, whose status is only known after a request
+connection_status = transport.connect()
+if connection_status is not None:
+    st.session_state.connected = connection_status
+
+# --- Finished Reply ---
+if st.session_state.pending_turn is not None and st.session_state.pending_turn.done():
+    reply_data = finish_turn(st.session_state.pending_turn)
+    if reply_data:
+        process_reply(reply_data) # This will rerun
+
+# --- UI Rendering Section ---
+# Only the most recent messages are drawn (see HISTORY_WINDOW)
+render_history(st.session_state.messages)
+
+# The reply still being fetched, below the history and above the buttons
+if st.session_state.pending_turn is not None:
+    show_pending_turn()
+
+# --- Render answer options as buttons ---
+if st.session_state.current_answer_options:
+    logger.debug("Rendering answer options: %s", st.session_state.current_answer_options)
+    with st.container():
+        st.write("---") # Separator for options
+        st.markdown("Choose an option:")
+        if PREFETCH_OPTIONS and not st.session_state.prefetched_replies:
+            prefetch_answer_options(st.session_state.current_answer_options)
+        cols = st.columns(len(st.session_state.current_answer_options))
+
+        for i, option_text in enumerate(st.session_state.current_answer_options):
+            with cols[i]:
+                if st.button(option_text, key=f"option_button_{i}"):
+                    logger.debug("Option button clicked: '%s'", option_text)
+                    # Keyed on the conversation before this click
+                    cache_key = get_response_cache().key_for(story_id, st.session_state.messages, option_text)
+                    prefetch = OptionPrefetcher.take(st.session_state.prefetched_replies, option_text)
+                    reply = None
+                    if prefetch is not None and prefetch.done():
+                        reply = prefetch.result()
+                    if reply:
+                        logger.debug("Using prefetched reply for '%s'", option_text)
+                        st.session_state.connected = True
+                        if cache_key is not None:
+                            get_response_cache().put(cache_key, reply)
+                    elif cache_key is not None:
+                        reply = get_response_cache().get(cache_key)
+                        if reply:
+                            logger.debug("Response cache hit for '%s'", option_text)
+
+                    # Without a reply at hand, fetch it (or wait for the prefetch
+                    # still in flight) off the script thread
+                    if reply or start_turn(option_text, cache_key, prefetch):
+                        st.session_state.messages.append(ChatMessage("user", option_text))
+                        st.session_state.current_answer_options = [] # Clear options immediately
+                        if reply:
+                            process_reply(reply) # This will rerun
+                        rerun() # Rerun to show the pending reply
+else:
+    logger.debug("No answer options to render")
+
+# Status messages
+if not st.session_state.connected and transport.is_connecting():
+    st.warning("Connecting to backend... (Please wait)")
+elif not st.session_state.connected:
+    st.error(f"Not connected to backend or connection failed. Please ensure the {transport.server} is running and try refreshing.")
+else:
+    st.success("Connected to backend.")
+
+# Persistent connections come up in the background; rerun once one is up
+if connection_status is False:
+    @st.fragment(run_every=1.0)
+    def wait_for_connection():
+        if transport.connect():
+            st.rerun()
+
+    wait_for_connection()
+
+
+# User input and send message
+# Connectionless protocols find out whether the backend is up from the first message;
+# transports with an outbox take messages while reconnecting (see WS_OUTBOX_SIZE)
+if (st.session_state.connected or connection_status is None or transport.queues_offline) and not st.session_state.current_answer_options:
+    if not st.session_state.connected and connection_status is not None:
+        st.caption("Messages sent now are delivered once the connection is back.")
+    if prompt := st.chat_input("Say something"):
+        # Send message to the backend, off the script thread
+        if start_turn(prompt):
+            st.session_state.messages.append(ChatMessage("user", prompt))
+            rerun() # Rerun to show the message and the pending reply
+
+elif not st.session_state.connected:
+    st.info("Waiting for connection to establish...")
+elif st.session_state.current_answer_options:
+    st.chat_input("Choose from options above...", disabled=True)
+
+# Runs that end early with rerun() are followed by one that gets here
+get_session_registry().touch(st.session_state.session_id, story_states())
+
+rerun_timer.stop()
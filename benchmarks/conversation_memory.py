@@ -0,0 +1,83 @@
+"""Memory held per session by the conversation history.
+
+Builds N conversations of M messages each and reports the Python heap they
+keep alive (via tracemalloc) for:
+
+* ``dicts``: a list of {"role", "content"} dicts (the old session state)
+* ``memory``: a Conversation of slotted ChatMessages, all kept in memory
+* ``sqlite`` / ``jsonl``: a Conversation backed by that store, keeping only
+  CONVERSATION_HOT_TAIL messages in memory
+
+    python benchmarks/conversation_memory.py --sessions 50 --messages 2000
+"""
+import argparse
+import gc
+import sys
+import tempfile
+import tracemalloc
+
+from harness import ROOT
+
+sys.path.insert(0, ROOT)
+from common.conversation_store import (  # noqa: E402
+    CONVERSATION_HOT_TAIL,
+    ChatMessage,
+    Conversation,
+    create_conversation_store,
+)
+
+
+def message_text(session, i, size):
+    # Distinct string objects per message, as replies from a backend would be
+    return f"session {session} message {i} " + "x" * size
+
+
+def build(kind, sessions, messages, size, hot_tail, directory):
+    roles = ["user", "assistant"]
+    if kind == "dicts":
+        return [
+            [{"role": roles[i % 2], "content": message_text(s, i, size)} for i in range(messages)]
+            for s in range(sessions)
+        ]
+    store = create_conversation_store(kind, directory)
+    conversations = []
+    for s in range(sessions):
+        conversation = Conversation(store, key=f"session-{s}:STRY1", hot_size=hot_tail)
+        for i in range(messages):
+            # Role strings built at runtime, as they arrive in JSON replies
+            conversation.append(ChatMessage("".join(roles[i % 2]), message_text(s, i, size)))
+        conversations.append(conversation)
+    return store, conversations
+
+
+def measure(kind, args):
+    with tempfile.TemporaryDirectory() as directory:
+        gc.collect()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        result = build(kind, args.sessions, args.messages, args.size, args.hot_tail, directory)
+        gc.collect()
+        used = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+        del result
+    return used
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--messages", type=int, default=2000, help="messages per session")
+    parser.add_argument("--size", type=int, default=200, help="characters of filler per message")
+    parser.add_argument("--hot-tail", type=int, default=CONVERSATION_HOT_TAIL)
+    args = parser.parse_args()
+
+    print(f"{args.sessions} sessions x {args.messages} messages (~{args.size} chars), hot tail {args.hot_tail}")
+    print(f"{'history':<8} {'KiB/session':>12} {'bytes/message':>14}")
+    for kind in ("dicts", "memory", "sqlite", "jsonl"):
+        used = measure(kind, args)
+        per_session = used / args.sessions
+        print(f"{kind:<8} {per_session / 1024:>12.1f} {per_session / args.messages:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Cold-start time to the first ``createChat`` mutation, per schema mode.
+
+Each run is a fresh Python process that builds the gql client the way
+the GraphQL transport does and sends one ``createChat``. Modes:
+
+* ``live``: ``fetch_schema_from_transport=True`` (the old client)
+* ``cache-cold``: ``GRAPHQL_SCHEMA_MODE=cache`` with no cache file yet
+* ``cache-warm``: ``GRAPHQL_SCHEMA_MODE=cache`` with the SDL already cached
+* ``offline``: ``GRAPHQL_SCHEMA_MODE=offline`` with the SDL already cached
+
+``--schema-delay`` makes the mock backend slower to answer introspection, to
+mimic a large schema or a backend busy with many pods starting at once.
+
+    python benchmarks/graphql_cold_start.py --runs 10 --schema-delay 0.2
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+from harness import ROOT, percentile, start_mock_backend, stop_processes
+
+MODES = ["live", "cache-cold", "cache-warm", "offline"]
+
+
+def first_message(url, mode, cache_path):
+    # Runs in the child process. Imports are left out of the client timing
+    # (they cost the same in every mode) but show up in the process timing.
+    sys.path.insert(0, ROOT)
+    from gql import Client, GraphQLRequest, gql
+    from gql.transport.httpx import HTTPXAsyncTransport
+
+    from common.graphql_schema import SchemaCache, load_client_schema
+
+    start = time.perf_counter()
+    schema, _ = load_client_schema(url, mode=mode, cache=SchemaCache(url, cache_path))
+    client = Client(
+        transport=HTTPXAsyncTransport(url=url),
+        schema=schema,
+        fetch_schema_from_transport=schema is None,
+    )
+    mutation = gql(
+        """
+        mutation CreateChat($input: CreateChatInput!) {
+            createChat(input: $input) { answers { name message } }
+        }
+        """
+    )
+    request = GraphQLRequest(mutation, variable_values={"input": {"storyId": "STRY1", "message": "hi"}})
+    client.execute(request)
+    return time.perf_counter() - start
+
+
+def run_child(url, mode, cache_path):
+    schema_mode = "cache" if mode.startswith("cache") else mode
+    if mode == "cache-cold" and os.path.exists(cache_path):
+        os.remove(cache_path)
+    start = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, __file__, "--child", schema_mode, "--url", url, "--cache", cache_path],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return time.perf_counter() - start, float(output)
+
+
+def backend_requests(port):
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/__stats?reset=1") as response:
+        return json.load(response)["requests"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--schema-delay", type=float, default=0.0)
+    parser.add_argument("--backend-port", type=int, default=3099)
+    parser.add_argument("--child", choices=["live", "cache", "offline"], help=argparse.SUPPRESS)
+    parser.add_argument("--url", help=argparse.SUPPRESS)
+    parser.add_argument("--cache", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(first_message(args.url, args.child, args.cache))
+        return
+
+    url = f"http://127.0.0.1:{args.backend_port}/graphql"
+    backend = start_mock_backend(args.backend_port, "--schema-delay", str(args.schema_delay))
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            cache_path = os.path.join(tmp, "schema.graphql")
+            print(f"{args.runs} runs per mode, introspection delay {1000 * args.schema_delay:.0f} ms")
+            print(f"{'mode':<11} {'process p50 ms':>15} {'client p50 ms':>14} {'client p99 ms':>14} {'reqs/start':>11}")
+            for mode in MODES:
+                backend_requests(args.backend_port)
+                timings = [run_child(url, mode, cache_path) for _ in range(args.runs)]
+                requests = backend_requests(args.backend_port)
+                process = [t[0] for t in timings]
+                client = [t[1] for t in timings]
+                print(
+                    f"{mode:<11} {1000 * percentile(process, 50):>15.1f} {1000 * percentile(client, 50):>14.1f}"
+                    f" {1000 * percentile(client, 99):>14.1f} {requests / args.runs:>11.1f}"
+                )
+    finally:
+        stop_processes(backend)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Process and timing helpers shared by the benchmark scripts."""
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+
+def start_process(args, env=None):
+    return subprocess.Popen(
+        args,
+        env={**os.environ, **(env or {})},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+def stop_processes(*procs):
+    for proc in procs:
+        proc.terminate()
+    for proc in procs:
+        proc.wait()
+
+
+def wait_for_http(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1):
+                return
+        except Exception:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+def start_mock_backend(port, *args):
+    proc = start_process([sys.executable, os.path.join(HERE, "mock_backend.py"), "--port", str(port), *args])
+    wait_for_http(f"http://127.0.0.1:{port}/__stats")
+    return proc
+
+
+def start_streamlit(script, port, env):
+    proc = start_process(
+        [
+            sys.executable, "-m", "streamlit", "run", script,
+            "--server.headless", "true",
+            "--server.port", str(port),
+            "--server.enableXsrfProtection", "false",
+            "--browser.gatherUsageStats", "false",
+        ],
+        env=env,
+    )
+    wait_for_http(f"http://127.0.0.1:{port}/_stcore/health")
+    return proc
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return float("nan")
+    index = min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))
+    return ordered[index]
@@ -0,0 +1,72 @@
+"""Rerun time of an app script as its conversation grows.
+
+Runs the script in-process with Streamlit's AppTest, preloads
+``st.session_state.messages`` with N messages and times full reruns. No
+backend is needed: an idle rerun never contacts it.
+
+    python benchmarks/history_render.py --script restapi-app.py --sizes 10 1000 10000
+
+To compare against an older revision, export it next to the current scripts
+(so ``common`` still imports) and point ``--script`` at it:
+
+    git show <rev>:restapi-app.py > restapi-app-before.py
+    python benchmarks/history_render.py --script restapi-app-before.py
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+from streamlit.testing.v1 import AppTest
+
+from harness import ROOT
+
+sys.path.insert(0, ROOT)
+from common.conversation_store import ChatMessage  # noqa: E402
+
+
+def make_messages(count):
+    roles = ["user", "assistant"]
+    return [
+        ChatMessage(roles[i % 2], f"Message **{i}** with a bit of *markdown* and a [link](https://example.com/{i}).")
+        for i in range(count)
+    ]
+
+
+def time_reruns(script, count, reruns):
+    at = AppTest.from_file(script, default_timeout=120)
+    at.session_state["messages"] = make_messages(count)
+    at.run()  # first run pays for imports and cached resources
+    timings = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        at.run()
+        timings.append(time.perf_counter() - start)
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    return timings, len(at.chat_message)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--script", default="restapi-app.py")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 10000])
+    parser.add_argument("--reruns", type=int, default=5)
+    args = parser.parse_args()
+
+    script = os.path.abspath(args.script if os.path.isabs(args.script) else os.path.join(ROOT, args.script))
+    # The apps read these at import; nothing is sent during an idle rerun
+    for name in ("API_WS_PORT", "API_REST_PORT", "API_GRAPHQL_PORT"):
+        os.environ.setdefault(name, "3099")
+    os.environ.setdefault("API_HOST", "http://127.0.0.1")
+
+    print(f"script: {script}")
+    print(f"{'messages':>9} {'drawn':>7} {'median ms':>10} {'max ms':>8}")
+    for count in args.sizes:
+        timings, drawn = time_reruns(script, count, args.reruns)
+        print(f"{count:>9} {drawn:>7} {1000 * statistics.median(timings):>10.1f} {1000 * max(timings):>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
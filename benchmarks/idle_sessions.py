@@ -0,0 +1,92 @@
+"""Reruns per second and CPU per idle session for a Streamlit chat app.
+
+Starts ``benchmarks/mock_backend.py`` and ``streamlit run <script>`` headless,
+opens N browser-less sessions over Streamlit's websocket protocol, lets them
+sit idle and reports how often each session reruns and how much CPU the
+Streamlit process burns per session.
+
+    python benchmarks/idle_sessions.py --script ws-app.py --sessions 20
+
+To compare against an older revision, export it and point ``--script`` at it:
+
+    git show <rev>:ws-app.py > /tmp/ws-app-before.py
+    python benchmarks/idle_sessions.py --script /tmp/ws-app-before.py
+"""
+import argparse
+import asyncio
+import os
+
+import psutil
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+from harness import ROOT, start_mock_backend, start_streamlit, stop_processes
+
+
+async def idle_session(port, counts, index, stop):
+    url = f"ws://127.0.0.1:{port}/_stcore/stream"
+    async with websockets.connect(url, subprotocols=["streamlit"], max_size=None) as ws:
+        msg = BackMsg()
+        msg.rerun_script.query_string = ""
+        await ws.send(msg.SerializeToString())
+        while not stop.is_set():
+            try:
+                raw = await asyncio.wait_for(ws.recv(), timeout=0.5)
+            except asyncio.TimeoutError:
+                continue
+            fwd = ForwardMsg()
+            fwd.ParseFromString(raw)
+            if fwd.WhichOneof("type") == "script_finished":
+                counts[index] += 1
+
+
+async def measure(port, pid, sessions, warmup, duration):
+    counts = [0] * sessions
+    stop = asyncio.Event()
+    tasks = [asyncio.create_task(idle_session(port, counts, i, stop)) for i in range(sessions)]
+    await asyncio.sleep(warmup)
+
+    proc = psutil.Process(pid)
+    reruns_before = sum(counts)
+    cpu_before = sum(proc.cpu_times()[:2])
+    await asyncio.sleep(duration)
+    cpu_used = sum(proc.cpu_times()[:2]) - cpu_before
+    reruns = sum(counts) - reruns_before
+
+    stop.set()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return reruns, cpu_used
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--script", default=os.path.join(ROOT, "ws-app.py"))
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--warmup", type=float, default=5.0)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--port", type=int, default=8599)
+    parser.add_argument("--backend-port", type=int, default=3099)
+    args = parser.parse_args()
+
+    backend = start_mock_backend(args.backend_port)
+    env = {"API_HOST": "http://127.0.0.1", "API_WS_PORT": str(args.backend_port)}
+    app = start_streamlit(args.script, args.port, env)
+    try:
+        reruns, cpu_used = asyncio.run(
+            measure(args.port, app.pid, args.sessions, args.warmup, args.duration)
+        )
+    finally:
+        stop_processes(app, backend)
+
+    print(f"script:                  {args.script}")
+    print(f"idle sessions:           {args.sessions}")
+    print(f"window:                  {args.duration:.0f}s")
+    print(f"reruns/s (all sessions): {reruns / args.duration:.2f}")
+    print(f"reruns/s per session:    {reruns / args.duration / args.sessions:.3f}")
+    print(f"CPU % (process):         {100 * cpu_used / args.duration:.1f}")
+    print(f"CPU % per idle session:  {100 * cpu_used / args.duration / args.sessions:.3f}")
+
+
+if __name__ == "__main__":
+    main()
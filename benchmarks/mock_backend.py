@@ -0,0 +1,358 @@
+"""Local stand-in for the NestJS chat backend.
+
+Speaks the same ``createChat`` contract as the real server over all three
+protocols used by the apps, on a single port:
+
+* REST: ``POST /api/chat`` and the SSE stream ``POST /api/chat/stream``
+* GraphQL: ``createChat`` mutation and ``chatStream`` subscription on ``/graphql``
+  (a JSON array of operations is answered as an array batch)
+* Socket.IO: ``createChat`` / ``messageChunk`` / ``messageReply`` events
+
+Replies can be slowed down (``--delay``, ``--delay-jitter``), padded
+(``--reply-size``) and made to offer answer options (``--options``,
+``--options-every``).
+
+Introspection queries on ``/graphql`` answer with an ``ETag`` and honour
+``If-None-Match`` with ``304 Not Modified``.
+
+Request bodies sent with ``Content-Encoding: gzip`` (or ``br``, with the
+brotli package) are decompressed; ``--compress`` gzips HTTP responses for
+clients that accept it. GraphQL operations may be Automatic Persisted
+Queries (``extensions.persistedQuery``): an unknown hash is answered with
+``PERSISTED_QUERY_NOT_FOUND`` until the text is sent along with it; with
+``--no-persisted-queries`` every such operation is rejected with
+``PERSISTED_QUERY_NOT_SUPPORTED``, as Apollo Server does with APQ off.
+``--socketio-serializer msgpack`` makes Socket.IO use MessagePack packets.
+
+A Socket.IO ``createChat`` with ``resume: true`` and a ``correlationId``
+that was already answered gets the stored reply again instead of a new one.
+
+``GET /__stats`` reports how many HTTP requests were served and over how many
+distinct TCP connections (``?reset=1`` zeroes those two counters), and how
+many replies were built in total over every protocol.
+
+    python benchmarks/mock_backend.py --port 3012
+
+Point every ``API_*_PORT`` variable at that port to run any of the apps
+against it.
+"""
+import argparse
+import asyncio
+import collections
+import gzip
+import hashlib
+import inspect
+import json
+import random
+
+import socketio
+import uvicorn
+from graphql import ExecutionResult, build_schema, graphql, parse, print_schema, subscribe
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route, WebSocketRoute
+
+SCHEMA = build_schema(
+    """
+    type Answer { name: String! message: String! }
+    type AnswerOptions { isNeeded: Boolean! options: [String!]! }
+    type ChatReply { answers: [Answer!]! answerOptions: AnswerOptions! }
+    type ChatChunk {
+        name: String!
+        delta: String!
+        done: Boolean!
+        answers: [Answer!]
+        answerOptions: AnswerOptions
+    }
+    input CreateChatInput { storyId: String! message: String! }
+    type Query { health: String! }
+    type Mutation { createChat(input: CreateChatInput!): ChatReply! }
+    type Subscription { chatStream(input: CreateChatInput!): ChatChunk! }
+    """
+)
+SCHEMA_ETAG = '"' + hashlib.sha256(print_schema(SCHEMA).encode("utf-8")).hexdigest()[:16] + '"'
+
+
+class MockBackend:
+    def __init__(
+        self,
+        chunk_delay=0.02,
+        schema_delay=0.0,
+        options=(),
+        options_every=1,
+        delay=0.0,
+        delay_jitter=0.0,
+        reply_size=0,
+        compress=False,
+        socketio_serializer="default",
+        persisted_queries=True,
+    ):
+        self.chunk_delay = chunk_delay
+        self.schema_delay = schema_delay
+        self.options = list(options)  # answer options offered with every `options_every`-th reply
+        self.options_every = max(1, options_every)
+        self.delay = delay  # seconds before a reply (or its first chunk) is sent
+        self.delay_jitter = delay_jitter  # plus up to this many seconds, uniformly random
+        self.reply_size = reply_size  # pad replies to at least this many characters
+        self.compress = compress  # gzip HTTP responses
+        self.socketio_serializer = socketio_serializer
+        self.replies = 0
+        self.requests = 0
+        self.connections = set()  # (client host, client port) of every HTTP connection seen
+        self.sent_replies = collections.OrderedDict()  # correlationId -> Socket.IO reply, for resumes
+        self.persisted_queries = {} if persisted_queries else None  # sha256 -> GraphQL query text
+
+    def count(self, request):
+        self.requests += 1
+        self.connections.add(tuple(request.client))
+
+    async def stats(self, request):
+        payload = {"requests": self.requests, "connections": len(self.connections), "replies": self.replies}
+        if request.query_params.get("reset"):
+            self.requests = 0
+            self.connections.clear()
+        return JSONResponse(payload)
+
+    async def read_json(self, request):
+        body = await request.body()
+        encoding = request.headers.get("Content-Encoding", "identity")
+        if encoding == "gzip":
+            body = gzip.decompress(body)
+        elif encoding == "br":
+            import brotli
+
+            body = brotli.decompress(body)
+        return json.loads(body)
+
+    async def think(self):
+        delay = self.delay + random.uniform(0, self.delay_jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def build_reply(self, message, correlation_id=None):
+        self.replies += 1
+        text = f"You said: {message}"
+        if len(text) < self.reply_size:
+            filler = " ".join(["lorem"] * ((self.reply_size - len(text)) // 6 + 1))
+            text = f"{text} {filler}"[:self.reply_size]
+        options = self.options if self.replies % self.options_every == 0 else []
+        reply = {
+            "answers": [{"name": "assistant", "message": text}],
+            "answerOptions": {"isNeeded": bool(options), "options": options},
+        }
+        if correlation_id is not None:
+            reply["correlationId"] = correlation_id
+        return reply
+
+    async def stream_reply(self, message):
+        # Yields (name, delta, None) word by word, then ("assistant", "", full reply)
+        await self.think()
+        reply = self.build_reply(message)
+        for answer in reply["answers"]:
+            for word in answer["message"].split(" "):
+                await asyncio.sleep(self.chunk_delay)
+                yield answer["name"], word + " ", None
+        yield "assistant", "", reply
+
+    # --- REST ---
+    async def rest_chat(self, request):
+        self.count(request)
+        data = await self.read_json(request)
+        await self.think()
+        return JSONResponse(self.build_reply(data.get("message", "")))
+
+    async def rest_chat_stream(self, request):
+        self.count(request)
+        data = await self.read_json(request)
+
+        async def events():
+            async for name, delta, reply in self.stream_reply(data.get("message", "")):
+                if reply is None:
+                    yield f"event: chunk\ndata: {json.dumps({'name': name, 'delta': delta})}\n\n"
+                else:
+                    yield f"event: done\ndata: {json.dumps(reply)}\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    # --- GraphQL ---
+    def graphql_root(self):
+        async def create_chat(info, input):
+            await self.think()
+            return self.build_reply(input["message"])
+
+        async def chat_stream(info, input):
+            async for name, delta, reply in self.stream_reply(input["message"]):
+                chunk = {"name": name, "delta": delta, "done": reply is not None}
+                if reply is not None:
+                    chunk.update(reply)
+                yield {"chatStream": chunk}
+
+        return {
+            "createChat": create_chat,
+            "chatStream": chat_stream,
+        }
+
+    async def execute_graphql(self, body):
+        query = body.get("query")
+        persisted = (body.get("extensions") or {}).get("persistedQuery")
+        if persisted and self.persisted_queries is None:
+            return {"errors": [{
+                "message": "PersistedQueryNotSupported",
+                "extensions": {"code": "PERSISTED_QUERY_NOT_SUPPORTED"},
+            }]}
+        if persisted:
+            # Automatic Persisted Queries, as in Apollo Server
+            sha256_hash = persisted.get("sha256Hash")
+            if query is None:
+                query = self.persisted_queries.get(sha256_hash)
+                if query is None:
+                    return {"errors": [{
+                        "message": "PersistedQueryNotFound",
+                        "extensions": {"code": "PERSISTED_QUERY_NOT_FOUND"},
+                    }]}
+            elif hashlib.sha256(query.encode("utf-8")).hexdigest() == sha256_hash:
+                self.persisted_queries[sha256_hash] = query
+            else:
+                return {"errors": [{"message": "provided sha does not match query"}]}
+        result = await graphql(
+            SCHEMA,
+            query,
+            root_value=self.graphql_root(),
+            variable_values=body.get("variables"),
+            operation_name=body.get("operationName"),
+        )
+        payload = {"data": result.data}
+        if result.errors:
+            payload["errors"] = [error.formatted for error in result.errors]
+        return payload
+
+    async def graphql_http(self, request):
+        self.count(request)
+        body = await self.read_json(request)
+        if isinstance(body, list):
+            # Array batching: the operations run concurrently, results come back in order
+            return JSONResponse(list(await asyncio.gather(*(self.execute_graphql(op) for op in body))))
+        introspection = "__schema" in (body.get("query") or "")
+        if introspection:
+            # Introspection answers carry an ETag so clients can revalidate a cached schema
+            if request.headers.get("If-None-Match") == SCHEMA_ETAG:
+                return Response(status_code=304, headers={"ETag": SCHEMA_ETAG})
+            await asyncio.sleep(self.schema_delay)
+        payload = await self.execute_graphql(body)
+        return JSONResponse(payload, headers={"ETag": SCHEMA_ETAG} if introspection else None)
+
+    async def graphql_ws(self, websocket):
+        # graphql-transport-ws protocol, enough for gql's WebsocketsTransport
+        await websocket.accept(subprotocol="graphql-transport-ws")
+        tasks = {}
+
+        async def run_subscription(op_id, payload):
+            stream = subscribe(
+                SCHEMA,
+                parse(payload["query"]),
+                root_value=self.graphql_root(),
+                variable_values=payload.get("variables"),
+            )
+            if inspect.isawaitable(stream):
+                stream = await stream
+            if isinstance(stream, ExecutionResult):
+                errors = [error.formatted for error in stream.errors or []]
+                await websocket.send_json({"id": op_id, "type": "error", "payload": errors})
+                return
+            async for result in stream:
+                await websocket.send_json({"id": op_id, "type": "next", "payload": {"data": result.data}})
+            await websocket.send_json({"id": op_id, "type": "complete"})
+
+        try:
+            while True:
+                msg = await websocket.receive_json()
+                if msg["type"] == "connection_init":
+                    await websocket.send_json({"type": "connection_ack"})
+                elif msg["type"] == "ping":
+                    await websocket.send_json({"type": "pong"})
+                elif msg["type"] == "subscribe":
+                    tasks[msg["id"]] = asyncio.create_task(run_subscription(msg["id"], msg["payload"]))
+                elif msg["type"] == "complete" and msg["id"] in tasks:
+                    tasks.pop(msg["id"]).cancel()
+        except Exception:
+            for task in tasks.values():
+                task.cancel()
+
+    # --- Socket.IO ---
+    def socketio_server(self):
+        sio = socketio.AsyncServer(async_mode="asgi", cors_allowed_origins="*", serializer=self.socketio_serializer)
+
+        @sio.on("createChat")
+        async def create_chat(sid, data):
+            message = data.get("message", "")
+            correlation_id = data.get("correlationId")
+            if data.get("resume") and correlation_id in self.sent_replies:
+                await sio.emit("messageReply", self.sent_replies[correlation_id], to=sid)
+                return
+            if data.get("stream"):
+                async for name, delta, reply in self.stream_reply(message):
+                    if reply is None:
+                        chunk = {"name": name, "delta": delta, "correlationId": correlation_id}
+                        await sio.emit("messageChunk", chunk, to=sid)
+                    else:
+                        reply["correlationId"] = correlation_id
+            else:
+                await self.think()
+                reply = self.build_reply(message, correlation_id)
+            if correlation_id is not None:
+                self.sent_replies[correlation_id] = reply
+                while len(self.sent_replies) > 1000:
+                    self.sent_replies.popitem(last=False)
+            await sio.emit("messageReply", reply, to=sid)
+
+        return sio
+
+    def create_app(self):
+        http_app = Starlette(
+            routes=[
+                Route("/api/chat", self.rest_chat, methods=["POST"]),
+                Route("/api/chat/stream", self.rest_chat_stream, methods=["POST"]),
+                Route("/graphql", self.graphql_http, methods=["POST"]),
+                WebSocketRoute("/graphql", self.graphql_ws),
+                Route("/__stats", self.stats),
+            ],
+            middleware=[Middleware(GZipMiddleware, minimum_size=500)] if self.compress else None,
+        )
+        return socketio.ASGIApp(self.socketio_server(), other_asgi_app=http_app)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3012)
+    parser.add_argument("--chunk-delay", type=float, default=0.02, help="seconds between streamed words")
+    parser.add_argument("--schema-delay", type=float, default=0.0, help="extra seconds to answer introspection")
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds before each reply")
+    parser.add_argument("--delay-jitter", type=float, default=0.0, help="extra random delay, up to this many seconds")
+    parser.add_argument("--reply-size", type=int, default=0, help="pad replies to this many characters")
+    parser.add_argument("--options", default="", help="comma-separated answer options to offer")
+    parser.add_argument("--options-every", type=int, default=1, help="offer the options on every N-th reply")
+    parser.add_argument("--compress", action="store_true", help="gzip HTTP responses when the client accepts it")
+    parser.add_argument("--socketio-serializer", choices=["default", "msgpack"], default="default")
+    parser.add_argument("--no-persisted-queries", action="store_true", help="reject Automatic Persisted Queries")
+    args = parser.parse_args()
+    options = [o for o in args.options.split(",") if o]
+    app = MockBackend(
+        chunk_delay=args.chunk_delay,
+        schema_delay=args.schema_delay,
+        options=options,
+        options_every=args.options_every,
+        delay=args.delay,
+        delay_jitter=args.delay_jitter,
+        reply_size=args.reply_size,
+        compress=args.compress,
+        socketio_serializer=args.socketio_serializer,
+        persisted_queries=not args.no_persisted_queries,
+    ).create_app()
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
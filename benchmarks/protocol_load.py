@@ -0,0 +1,252 @@
+"""Cross-protocol latency, throughput and resource use against the mock backend.
+
+Drives the ``createChat`` contract over REST, GraphQL and Socket.IO with N
+concurrent simulated sessions, each sending M messages back to back, using the
+same client setup as the apps:
+
+* ``rest``: the shared ``httpx.AsyncClient`` (``REST_ASYNC_CLIENT``), or SSE
+  from ``/api/chat/stream`` with ``--stream``
+* ``graphql``: one connected gql session over HTTP, or the ``chatStream``
+  subscription over one websocket with ``--stream``
+* ``socketio``: ``WS_POOL_SIZE`` shared connections with correlationIds, with
+  ``messageChunk`` events when ``--stream`` is on
+
+For every protocol it reports round-trip p50/p95/p99, time-to-render (when the
+first text could be drawn: the first chunk when streaming, otherwise the full
+reply), messages/s, and the CPU and memory used by the client and the mock.
+
+    python benchmarks/protocol_load.py --sessions 50 --messages 20 --delay 0.05
+    python benchmarks/protocol_load.py --sessions 50 --stream
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import uuid
+
+import psutil
+import socketio
+from gql import Client, GraphQLRequest, gql
+from gql.transport.httpx import HTTPXAsyncTransport
+from gql.transport.websockets import WebsocketsTransport
+
+from harness import ROOT, percentile, start_mock_backend, stop_processes
+
+sys.path.insert(0, ROOT)
+from common.http_client import create_async_http_client  # noqa: E402
+from common.streaming import iter_sse_events  # noqa: E402
+
+PROTOCOLS = ["rest", "graphql", "socketio"]
+
+CHAT_MUTATION = gql(
+    """
+    mutation CreateChat($input: CreateChatInput!) {
+        createChat(input: $input) { answers { name message } answerOptions { isNeeded options } }
+    }
+    """
+)
+CHAT_SUBSCRIPTION = gql(
+    """
+    subscription ChatStream($input: CreateChatInput!) {
+        chatStream(input: $input) { name delta done answers { name message } }
+    }
+    """
+)
+
+
+class Timing:
+    """Round-trip and time-to-render of one message."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.first = None
+        self.end = None
+
+    def chunk(self):
+        if self.first is None:
+            self.first = time.perf_counter()
+
+    def done(self):
+        self.end = time.perf_counter()
+        self.chunk()
+
+
+# --- REST ---
+async def rest_client(base_url, stream):
+    client = create_async_http_client()
+
+    async def send(message, session_index):
+        timing = Timing()
+        payload = {"storyId": "STRY1", "message": message}
+        if not stream:
+            response = await client.post(f"{base_url}/api/chat", json=payload)
+            response.raise_for_status()
+            response.json()
+        else:
+            async with client.stream("POST", f"{base_url}/api/chat/stream", json=payload) as response:
+                response.raise_for_status()
+                lines = []
+                async for line in response.aiter_lines():
+                    if line.startswith("data:"):
+                        timing.chunk()
+                    lines.append(line)
+                for event, data in iter_sse_events(lines):
+                    json.loads(data)
+        timing.done()
+        return timing
+
+    return send, client.aclose
+
+
+# --- GraphQL ---
+async def graphql_client(base_url, stream):
+    if not stream:
+        client = Client(transport=HTTPXAsyncTransport(url=f"{base_url}/graphql"))
+    else:
+        client = Client(transport=WebsocketsTransport(url=f"{base_url.replace('http', 'ws', 1)}/graphql"))
+    session = await client.connect_async()
+
+    async def send(message, session_index):
+        timing = Timing()
+        variables = {"input": {"storyId": "STRY1", "message": message}}
+        if not stream:
+            await session.execute(GraphQLRequest(CHAT_MUTATION, variable_values=variables))
+        else:
+            async for result in session.subscribe(GraphQLRequest(CHAT_SUBSCRIPTION, variable_values=variables)):
+                timing.chunk()
+                if result["chatStream"]["done"]:
+                    break
+        timing.done()
+        return timing
+
+    return send, client.close_async
+
+
+# --- Socket.IO ---
+async def socketio_client(base_url, stream, pool_size):
+    # Synchronous clients, like ws-app.py's pool; their handlers run on
+    # python-socketio's threads and hand results back to the event loop
+    loop = asyncio.get_running_loop()
+    pending = {}  # correlationId -> (Timing, Future)
+    clients = []
+    for _ in range(pool_size):
+        sio = socketio.Client()
+
+        @sio.on("messageChunk")
+        def on_chunk(data):
+            entry = pending.get(data.get("correlationId"))
+            if entry is not None:
+                entry[0].chunk()
+
+        @sio.on("messageReply")
+        def on_reply(data):
+            entry = pending.pop(data.get("correlationId"), None)
+            if entry is not None:
+                entry[0].done()
+                loop.call_soon_threadsafe(entry[1].set_result, entry[0])
+
+        await asyncio.to_thread(sio.connect, base_url)
+        clients.append(sio)
+
+    async def send(message, session_index):
+        correlation_id = uuid.uuid4().hex
+        timing = Timing()
+        future = loop.create_future()
+        pending[correlation_id] = (timing, future)
+        payload = {"storyId": "STRY1", "message": message, "correlationId": correlation_id}
+        if stream:
+            payload["stream"] = True
+        clients[session_index % len(clients)].emit("createChat", payload)
+        return await future
+
+    async def close():
+        for sio in clients:
+            await asyncio.to_thread(sio.disconnect)
+
+    return send, close
+
+
+async def run_protocol(protocol, base_url, args):
+    if protocol == "rest":
+        send, close = await rest_client(base_url, args.stream)
+    elif protocol == "graphql":
+        send, close = await graphql_client(base_url, args.stream)
+    else:
+        send, close = await socketio_client(base_url, args.stream, args.ws_pool_size)
+
+    async def session(index):
+        return [await send(f"session {index} message {i}", index) for i in range(args.messages)]
+
+    try:
+        await send("warm-up", 0)
+        start = time.perf_counter()
+        results = await asyncio.gather(*(session(i) for i in range(args.sessions)))
+        elapsed = time.perf_counter() - start
+    finally:
+        await close()
+    return [t for timings in results for t in timings], elapsed
+
+
+def resource_snapshot(proc):
+    cpu = proc.cpu_times()
+    return cpu.user + cpu.system, proc.memory_info().rss
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--protocols", nargs="+", choices=PROTOCOLS, default=PROTOCOLS)
+    parser.add_argument("--sessions", type=int, default=50, help="concurrent simulated sessions")
+    parser.add_argument("--messages", type=int, default=20, help="messages per session")
+    parser.add_argument("--stream", action="store_true", help="request streamed replies")
+    parser.add_argument("--ws-pool-size", type=int, default=int(os.getenv("WS_POOL_SIZE", "2")))
+    parser.add_argument("--backend-port", type=int, default=3099)
+    parser.add_argument("--delay", type=float, default=0.0, help="mock: seconds before each reply")
+    parser.add_argument("--delay-jitter", type=float, default=0.0, help="mock: extra random delay")
+    parser.add_argument("--reply-size", type=int, default=0, help="mock: characters per reply")
+    parser.add_argument("--chunk-delay", type=float, default=0.02, help="mock: seconds between streamed words")
+    parser.add_argument("--options", default="", help="mock: comma-separated answer options")
+    args = parser.parse_args()
+
+    backend = start_mock_backend(
+        args.backend_port,
+        "--delay", str(args.delay),
+        "--delay-jitter", str(args.delay_jitter),
+        "--reply-size", str(args.reply_size),
+        "--chunk-delay", str(args.chunk_delay),
+        "--options", args.options,
+    )
+    base_url = f"http://127.0.0.1:{args.backend_port}"
+    client_proc, backend_proc = psutil.Process(), psutil.Process(backend.pid)
+    try:
+        print(
+            f"{args.sessions} sessions x {args.messages} messages, {'streamed' if args.stream else 'unstreamed'},"
+            f" mock delay {1000 * args.delay:.0f} ms (+{1000 * args.delay_jitter:.0f} ms jitter), reply size {args.reply_size}"
+        )
+        print(
+            f"{'protocol':<9} {'rtt p50':>8} {'p95':>7} {'p99':>7} {'render p50':>11} {'p95':>7} {'p99':>7}"
+            f" {'msg/s':>7} {'client cpu s':>13} {'client rss MiB':>15} {'mock cpu s':>11}"
+        )
+        for protocol in args.protocols:
+            client_cpu, _ = resource_snapshot(client_proc)
+            backend_cpu, _ = resource_snapshot(backend_proc)
+            timings, elapsed = asyncio.run(run_protocol(protocol, base_url, args))
+            client_cpu_after, client_rss = resource_snapshot(client_proc)
+            backend_cpu_after, _ = resource_snapshot(backend_proc)
+            rtt = [t.end - t.start for t in timings]
+            render = [t.first - t.start for t in timings]
+            print(
+                f"{protocol:<9} {1000 * percentile(rtt, 50):>8.1f} {1000 * percentile(rtt, 95):>7.1f}"
+                f" {1000 * percentile(rtt, 99):>7.1f} {1000 * percentile(render, 50):>11.1f}"
+                f" {1000 * percentile(render, 95):>7.1f} {1000 * percentile(render, 99):>7.1f}"
+                f" {len(timings) / elapsed:>7.0f} {client_cpu_after - client_cpu:>13.2f}"
+                f" {client_rss / 2**20:>15.1f} {backend_cpu_after - backend_cpu:>11.2f}"
+            )
+        print("latencies in ms")
+    finally:
+        stop_processes(backend)
+
+
+if __name__ == "__main__":
+    main()
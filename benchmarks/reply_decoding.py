@@ -0,0 +1,106 @@
+"""Decode-and-parse time of a reply body, old path vs each REPLY_DECODER.
+
+Builds a ``{answers, answerOptions}`` body with N answers of S characters
+each (a few of them malformed with ``--malformed``) and times, per body:
+
+* ``before``: ``json.loads`` followed by the old ``parse_reply`` walk (what
+  ``response.json()`` plus the apps' per-item checks cost)
+* one row per decoder from ``common.replies`` that is installed (``json``,
+  ``orjson``, ``msgspec``), each going from raw bytes to a ``Reply``
+
+No backend is needed.
+
+    python benchmarks/reply_decoding.py --answers 1 50 500 --answer-size 2000
+"""
+import argparse
+import json
+import logging
+import statistics
+import sys
+import time
+
+from harness import ROOT, percentile
+
+sys.path.insert(0, ROOT)
+from common.conversation_store import ChatMessage  # noqa: E402
+from common.replies import DECODERS  # noqa: E402
+
+
+def parse_before(raw):
+    # json.loads + parse_reply as of user-015
+    data = json.loads(raw)
+    answers = data.get('answers') or []
+    answer_options = data.get('answerOptions') or {}
+    if not isinstance(answers, list):
+        answers = [answers]
+    messages = []
+    for item in answers:
+        if isinstance(item, dict) and 'name' in item and 'message' in item:
+            message = item.get('message') or ''
+            if message.strip():
+                messages.append(ChatMessage(item.get('name') or 'assistant', message))
+        else:
+            logging.getLogger("chat.benchmark").warning("Received malformed item in answers array: %s", item)
+    options = []
+    if isinstance(answer_options, dict):
+        candidates = answer_options.get('options', [])
+        if answer_options.get('isNeeded', False) and isinstance(candidates, list) and candidates:
+            options = candidates
+    return messages, options
+
+
+def make_body(answers, answer_size, malformed):
+    items = [
+        {"name": "assistant", "message": f"Answer {i}: " + "lorem ipsum " * (answer_size // 12)}
+        for i in range(answers)
+    ]
+    for i in range(min(malformed, answers)):
+        items[i * answers // malformed] = {"name": "assistant", "text": "no message field"}
+    body = {"answers": items, "answerOptions": {"isNeeded": True, "options": ["Yes", "No", "Maybe"]}}
+    return json.dumps(body).encode()
+
+
+def time_decoder(decode, raw, iterations):
+    decode(raw)  # warm up
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        decode(raw)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--answers", type=int, nargs="+", default=[1, 50, 500])
+    parser.add_argument("--answer-size", type=int, default=2000, help="characters per answer")
+    parser.add_argument("--malformed", type=int, default=0, help="malformed answers per body")
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    # One warning per malformed item (before) or per body (after) would drown the table
+    logging.disable(logging.WARNING)
+
+    decoders = {"before": parse_before}
+    for name, factory in DECODERS.items():
+        try:
+            decoders[name] = factory()
+        except ImportError:
+            print(f"{name}: not installed, skipped")
+
+    print(f"{'answers':>8} {'body KiB':>9} {'decoder':<8} {'p50 us':>10} {'p99 us':>10} {'vs before':>10}")
+    for count in args.answers:
+        raw = make_body(count, args.answer_size, args.malformed)
+        baseline = None
+        for name, decode in decoders.items():
+            timings = time_decoder(decode, raw, args.iterations)
+            median = statistics.median(timings)
+            baseline = baseline or median
+            print(
+                f"{count:>8} {len(raw) / 1024:>9.0f} {name:<8} {1e6 * median:>10.1f}"
+                f" {1e6 * percentile(timings, 99):>10.1f} {baseline / median:>9.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Latency and connection reuse of the REST chat clients.
+
+Sends the same messages to the mock backend's ``/api/chat`` three ways and
+reports p50/p99 round-trip latency and how many TCP connections were opened
+per 1,000 messages:
+
+* ``per-call``: a module-level ``requests.post`` per message (the old client)
+* ``session``: the pooled keep-alive ``requests.Session`` used by the REST transport
+* ``async``: the shared ``httpx.AsyncClient`` used with ``REST_ASYNC_CLIENT``
+
+    python benchmarks/rest_client.py --messages 1000 --concurrency 8
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from harness import ROOT, percentile, start_mock_backend, stop_processes
+
+sys.path.insert(0, ROOT)
+from common.http_client import REST_TIMEOUT, create_async_http_client, create_http_session  # noqa: E402
+
+
+def backend_stats(port, reset=False):
+    url = f"http://127.0.0.1:{port}/__stats" + ("?reset=1" if reset else "")
+    with urllib.request.urlopen(url) as response:
+        return json.load(response)
+
+
+def run_threaded(post, url, messages, concurrency):
+    def timed(message):
+        start = time.perf_counter()
+        response = post(url, json={"storyId": "STRY1", "message": message}, timeout=REST_TIMEOUT)
+        response.raise_for_status()
+        response.json()
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(timed, messages))
+
+
+async def run_async(url, messages, concurrency, max_connections):
+    client = create_async_http_client(max_connections=max_connections)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def timed(message):
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post(url, json={"storyId": "STRY1", "message": message})
+            response.raise_for_status()
+            response.json()
+            return time.perf_counter() - start
+
+    try:
+        return await asyncio.gather(*(timed(m) for m in messages))
+    finally:
+        await client.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--pool-size", type=int, default=8, help="max keep-alive connections")
+    parser.add_argument("--backend-port", type=int, default=3099)
+    args = parser.parse_args()
+
+    url = f"http://127.0.0.1:{args.backend_port}/api/chat"
+    messages = [f"message {i}" for i in range(args.messages)]
+    session = create_http_session(pool_maxsize=args.pool_size, pool_block=True)
+    modes = {
+        "per-call": lambda: run_threaded(requests.post, url, messages, args.concurrency),
+        "session": lambda: run_threaded(session.post, url, messages, args.concurrency),
+        "async": lambda: asyncio.run(run_async(url, messages, args.concurrency, args.pool_size)),
+    }
+
+    backend = start_mock_backend(args.backend_port)
+    try:
+        print(f"{args.messages} messages, concurrency {args.concurrency}, pool size {args.pool_size}")
+        print(f"{'client':<10} {'p50 ms':>8} {'p99 ms':>8} {'msg/s':>8} {'conns/1k msgs':>14}")
+        for name, run in modes.items():
+            backend_stats(args.backend_port, reset=True)
+            start = time.perf_counter()
+            latencies = run()
+            elapsed = time.perf_counter() - start
+            connections = backend_stats(args.backend_port)["connections"]
+            print(
+                f"{name:<10} {1000 * percentile(latencies, 50):>8.2f} {1000 * percentile(latencies, 99):>8.2f}"
+                f" {len(latencies) / elapsed:>8.0f} {1000 * connections / len(latencies):>14.1f}"
+            )
+    finally:
+        stop_processes(backend)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""Headless multi-session load simulator for the Streamlit app scripts.
+
+Drives one of the app scripts through Streamlit's AppTest API as many
+simulated sessions against the mock backend. Each session plays a number of
+turns: it clicks one of the ``option_button_{i}`` buttons when the app offers
+options and otherwise sends a chat input. The simulator records every rerun's
+wall time and samples the process's RSS and thread count over time.
+
+    python benchmarks/session_simulator.py --script restapi-app.py --sessions 200 --turns 5
+    python benchmarks/session_simulator.py --script ws-app.py --sessions 100 --timeline /tmp/ws.csv
+
+All sessions stay alive for the whole run and are driven in lock step from
+one thread (AppTest is not thread-safe): every session acts, then sessions
+still waiting for a reply are rerun round-robin every ``--poll`` seconds
+until it shows up. That is how the app gets its replies here: its
+pending-reply fragment needs a browser, which AppTest does not have. Each of
+those reruns is counted.
+AppTest gives every session the same session id, so the simulator assigns its
+own, and it keeps conversations in memory (a disk store would be shared).
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+import psutil
+
+from harness import ROOT, percentile, start_mock_backend, stop_processes
+
+
+class Sampler(threading.Thread):
+    """Samples RSS and thread count of this process every `interval` seconds."""
+
+    def __init__(self, interval):
+        super().__init__(name="sampler", daemon=True)
+        self.interval = interval
+        self.proc = psutil.Process()
+        self.samples = []  # (seconds since start, rss bytes, threads)
+        self.stopped = threading.Event()
+        self.start_time = time.monotonic()
+
+    def sample(self):
+        self.samples.append((time.monotonic() - self.start_time, self.proc.memory_info().rss, self.proc.num_threads()))
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.sample()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        self.sample()
+
+
+class SimulatedSession:
+    def __init__(self, script, index, args):
+        from streamlit.testing.v1 import AppTest
+
+        self.at = AppTest.from_file(script, default_timeout=args.timeout)
+        self.index = index
+        self.args = args
+        self.rerun_times = []
+        self.at.session_state["session_id"] = f"sim-{index}"
+
+    def rerun(self, action=None):
+        start = time.perf_counter()
+        (action or self.at).run()
+        self.rerun_times.append(time.perf_counter() - start)
+
+    def message_count(self):
+        return len(self.at.session_state["messages"])
+
+    def start(self):
+        self.rerun()
+        # REST and GraphQL show the chat input right away; Socket.IO once its
+        # connection is up, which is waited for like a reply
+        return lambda: bool(self.at.chat_input)
+
+    def turn(self, number):
+        """Send a message or click an option; returns the condition that ends the turn, or None."""
+        before = self.message_count()
+        options = [b for b in self.at.button if b.key and b.key.startswith("option_button_")]
+        if options:
+            self.rerun(random.choice(options).click())
+        elif self.at.chat_input and not self.at.chat_input[0].disabled:
+            self.rerun(self.at.chat_input[0].set_value(f"session {self.index} turn {number}"))
+        else:
+            return None
+        # Done once the user message and at least one reply are in the history
+        return lambda: self.message_count() >= before + 2
+
+
+def run_step(sessions, step, args):
+    """Let every session take `step`, then rerun the waiting ones until done; returns how many finished."""
+    waiting = {}
+    for session in sessions:
+        done = step(session)
+        if done is not None:
+            waiting[session] = done
+    finished = 0
+    deadline = time.monotonic() + args.timeout
+    while waiting and time.monotonic() < deadline:
+        for session, done in list(waiting.items()):
+            if done():
+                finished += 1
+                del waiting[session]
+        if waiting:
+            time.sleep(args.poll)
+            for session in waiting:
+                session.rerun()
+    return finished
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--script", default="restapi-app.py")
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--turns", type=int, default=5, help="chat inputs / option clicks per session")
+    parser.add_argument("--poll", type=float, default=0.05, help="seconds between reruns while waiting for a reply")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--sample-interval", type=float, default=0.5)
+    parser.add_argument("--timeline", help="write 'seconds,rss_mib,threads' samples to this CSV file")
+    parser.add_argument("--backend-port", type=int, default=3099)
+    parser.add_argument("--delay", type=float, default=0.0, help="mock: seconds before each reply")
+    parser.add_argument("--options", default="Yes,No,Maybe", help="mock: answer options to offer")
+    parser.add_argument("--options-every", type=int, default=2, help="mock: offer options on every N-th reply")
+    args = parser.parse_args()
+
+    script = os.path.abspath(args.script if os.path.isabs(args.script) else os.path.join(ROOT, args.script))
+    port = str(args.backend_port)
+    os.environ.update(
+        API_HOST="http://127.0.0.1", API_WS_PORT=port, API_REST_PORT=port, API_GRAPHQL_PORT=port,
+        CONVERSATION_STORE="memory",
+    )
+    sys.path.insert(0, ROOT)
+
+    backend = start_mock_backend(
+        args.backend_port,
+        "--delay", str(args.delay),
+        "--options", args.options,
+        "--options-every", str(args.options_every),
+    )
+    sampler = Sampler(args.sample_interval)
+    sampler.start()
+    start = time.perf_counter()
+    try:
+        sessions = [SimulatedSession(script, i, args) for i in range(args.sessions)]
+        run_step(sessions, SimulatedSession.start, args)
+        completed = sum(
+            run_step(sessions, lambda session: session.turn(number), args) for number in range(args.turns)
+        )
+        for session in sessions:
+            if session.at.exception:
+                print(f"--- session {session.index}: {session.at.exception[0].message} ---")
+    finally:
+        elapsed = time.perf_counter() - start
+        sampler.stop()
+        stop_processes(backend)
+
+    rerun_times = [t for session in sessions for t in session.rerun_times]
+    peak_rss = max(rss for _, rss, _ in sampler.samples)
+    peak_threads = max(threads for _, _, threads in sampler.samples)
+    print(f"script:               {script}")
+    print(f"sessions x turns:     {args.sessions} x {args.turns} ({completed} turns completed)")
+    print(f"wall time:            {elapsed:.1f}s ({completed / elapsed:.1f} turns/s)")
+    print(f"reruns:               {len(rerun_times)} ({len(rerun_times) / max(completed, 1):.1f} per turn)")
+    print(
+        f"rerun wall time ms:   mean {1000 * statistics.mean(rerun_times):.1f}, p50 {1000 * percentile(rerun_times, 50):.1f},"
+        f" p95 {1000 * percentile(rerun_times, 95):.1f}, p99 {1000 * percentile(rerun_times, 99):.1f}"
+    )
+    print(f"peak RSS:             {peak_rss / 2**20:.0f} MiB ({peak_rss / 2**10 / args.sessions:.0f} KiB per session)")
+    print(f"threads:              peak {peak_threads}, at end {sampler.samples[-1][2]}")
+
+    if args.timeline:
+        with open(args.timeline, "w") as f:
+            f.write("seconds,rss_mib,threads\n")
+            for seconds, rss, threads in sampler.samples:
+                f.write(f"{seconds:.2f},{rss / 2**20:.1f},{threads}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Import time and memory of each protocol's client stack, before and after app.py.
+
+Each run is a fresh Python process that first imports streamlit (not timed;
+every variant needs it) and then either:
+
+* ``before``: the module-level imports of the old per-protocol script
+  (``restapi-app.py`` loaded httpx even without ``REST_ASYNC_CLIENT``,
+  ``graphql-app.py`` loaded the websockets transport even without streaming)
+* ``after``: ``create_transport(name)``, which imports only that protocol's
+  transport module and builds the transport without touching the network
+
+and reports the time that took, the RSS it added and the modules it loaded.
+The ``all`` row is every protocol's imports at once, what a single entry point
+would cost if it imported its clients eagerly.
+
+    python benchmarks/transport_imports.py --runs 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from harness import ROOT, percentile
+
+# The third-party and transport-specific imports at the top of the old scripts
+BEFORE_IMPORTS = {
+    "rest": ["requests", "httpx", "common.event_loop", "common.http_client", "common.streaming"],
+    "graphql": [
+        "gql", "gql.transport.exceptions", "gql.transport.httpx", "gql.transport.websockets", "asyncio",
+        "graphql", "common.event_loop", "common.graphql_schema", "common.streaming",
+    ],
+    "socketio": ["socketio", "queue", "uuid", "common.streaming"],
+}
+
+
+def measure(variant, name):
+    # Runs in the child process
+    sys.path.insert(0, ROOT)
+    import psutil
+    import streamlit  # noqa: F401
+
+    proc = psutil.Process()
+    rss_before = proc.memory_info().rss
+    modules_before = len(sys.modules)
+    start = time.perf_counter()
+    if variant == "before":
+        import importlib
+
+        modules = sum(BEFORE_IMPORTS.values(), []) if name == "all" else BEFORE_IMPORTS[name]
+        for module in modules:
+            importlib.import_module(module)
+    else:
+        from common.transports import create_transport
+
+        create_transport(name)
+    elapsed = time.perf_counter() - start
+    return {
+        "seconds": elapsed,
+        "rss": proc.memory_info().rss - rss_before,
+        "modules": len(sys.modules) - modules_before,
+    }
+
+
+def run_child(variant, name):
+    env = {
+        **os.environ,
+        "API_HOST": "http://127.0.0.1", "API_REST_PORT": "1", "API_GRAPHQL_PORT": "1", "API_WS_PORT": "1",
+        # Keep the GraphQL schema load from reaching for a server or a cache file
+        "GRAPHQL_SCHEMA_MODE": "offline", "GRAPHQL_SCHEMA_CACHE": os.devnull,
+    }
+    output = subprocess.run(
+        [sys.executable, __file__, "--child", variant, name],
+        check=True,
+        capture_output=True,
+        text=True,
+        env=env,
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--child", nargs=2, metavar=("VARIANT", "NAME"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(*args.child)))
+        return
+
+    print(f"{args.runs} runs per variant, after `import streamlit`")
+    print(f"{'transport':<10} {'variant':<7} {'import p50 ms':>14} {'import p99 ms':>14} {'RSS MiB':>8} {'modules':>8}")
+    for name in [*BEFORE_IMPORTS, "all"]:
+        for variant in ("before", "after") if name != "all" else ("before",):
+            results = [run_child(variant, name) for _ in range(args.runs)]
+            seconds = [r["seconds"] for r in results]
+            print(
+                f"{name:<10} {variant:<7} {1000 * percentile(seconds, 50):>14.1f} {1000 * percentile(seconds, 99):>14.1f}"
+                f" {statistics.median(r['rss'] for r in results) / 2**20:>8.1f}"
+                f" {statistics.median(r['modules'] for r in results):>8.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
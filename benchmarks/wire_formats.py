@@ -0,0 +1,154 @@
+"""Bytes on the wire and latency per message for each wire format.
+
+Sends M messages one after another through the apps' own transports, each
+pointed at the mock backend through a TCP proxy that counts the bytes going
+each way (HTTP headers, Socket.IO framing and all):
+
+* ``rest``: plain JSON, then ``REST_COMPRESSION=gzip`` (and ``br`` when the
+  brotli package is installed) against a mock that gzips its responses
+* ``graphql``: the full ``createChat`` mutation text, then
+  ``GRAPHQL_PERSISTED_QUERIES`` (hash only)
+* ``socketio``: JSON packets, then ``WS_SERIALIZER=msgpack``
+
+One warm-up message per format is left out of the counts, so connections,
+schema loading and the first persisted-query miss are not included.
+
+    python benchmarks/wire_formats.py --messages 200 --reply-size 4000 --message-size 1500
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+from harness import ROOT, percentile, start_mock_backend, stop_processes
+
+sys.path.insert(0, ROOT)
+# The GraphQL transport introspects the mock once, instead of refreshing a
+# cached schema in the background while bytes are being counted
+os.environ.setdefault("GRAPHQL_SCHEMA_MODE", "live")
+from common.event_loop import BackgroundLoop  # noqa: E402
+from common.transports.graphql_transport import GraphQLTransport  # noqa: E402
+from common.transports.rest_transport import RestTransport  # noqa: E402
+from common.transports.socketio_transport import SocketIOTransport  # noqa: E402
+
+
+class CountingProxy:
+    """Forwards 127.0.0.1:<port> to the target port and counts the bytes sent each way."""
+
+    def __init__(self, target_port):
+        self.target_port = target_port
+        self.up = 0
+        self.down = 0
+        self.loop = BackgroundLoop(name="counting-proxy")
+        self.server = self.loop.run(asyncio.start_server(self._handle, "127.0.0.1", 0))
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def _pipe(self, reader, writer, direction):
+        try:
+            while data := await reader.read(65536):
+                setattr(self, direction, getattr(self, direction) + len(data))
+                writer.write(data)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _handle(self, reader, writer):
+        target_reader, target_writer = await asyncio.open_connection("127.0.0.1", self.target_port)
+        await asyncio.gather(self._pipe(reader, target_writer, "up"), self._pipe(target_reader, writer, "down"))
+
+    def reset(self):
+        self.up = self.down = 0
+
+    def close(self):
+        self.loop.loop.call_soon_threadsafe(self.server.close)
+
+
+def socketio_transport(url, serializer):
+    transport = SocketIOTransport(url=url, size=1, serializer=serializer)
+    transport.connect()
+    deadline = time.monotonic() + 10
+    while not transport.connect():
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"Socket.IO did not connect to {url}")
+        time.sleep(0.05)
+    return transport
+
+
+def formats(brotli_installed):
+    # (protocol, format, which mock, transport factory taking the proxy's base URL)
+    rows = [
+        ("rest", "json", "plain", lambda base: RestTransport(url=f"{base}/api/chat", compression="off")),
+        ("rest", "gzip", "packed", lambda base: RestTransport(url=f"{base}/api/chat", compression="gzip")),
+    ]
+    if brotli_installed:
+        rows.append(("rest", "br", "packed", lambda base: RestTransport(url=f"{base}/api/chat", compression="br")))
+    rows += [
+        ("graphql", "query", "plain", lambda base: GraphQLTransport(url=f"{base}/graphql", persisted_queries=False)),
+        ("graphql", "apq", "plain", lambda base: GraphQLTransport(url=f"{base}/graphql", persisted_queries=True)),
+        ("socketio", "json", "plain", lambda base: socketio_transport(base, "json")),
+        ("socketio", "msgpack", "packed", lambda base: socketio_transport(base, "msgpack")),
+    ]
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--protocols", nargs="+", choices=["rest", "graphql", "socketio"], default=["rest", "graphql", "socketio"])
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--message-size", type=int, default=200, help="characters per chat message")
+    parser.add_argument("--reply-size", type=int, default=2000, help="pad mock replies to this many characters")
+    parser.add_argument("--delay", type=float, default=0.0, help="mock seconds before each reply")
+    parser.add_argument("--port", type=int, default=3040, help="first of the two mock backend ports")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)  # reconnects after the Socket.IO rows
+    try:
+        import brotli  # noqa: F401
+        brotli_installed = True
+    except ImportError:
+        brotli_installed = False
+
+    mock_args = ["--reply-size", str(args.reply_size), "--delay", str(args.delay)]
+    mocks = {
+        "plain": start_mock_backend(args.port, *mock_args),
+        "packed": start_mock_backend(args.port + 1, *mock_args, "--compress", "--socketio-serializer", "msgpack"),
+    }
+    proxies = {"plain": CountingProxy(args.port), "packed": CountingProxy(args.port + 1)}
+    try:
+        print(f"{args.messages} messages of {args.message_size} chars, replies of {args.reply_size} chars")
+        print(f"{'protocol':<9} {'format':<8} {'up B/msg':>9} {'down B/msg':>11} {'total vs first':>15} {'p50 ms':>8} {'p99 ms':>8}")
+        baseline = {}
+        for protocol, name, mock, create in formats(brotli_installed):
+            if protocol not in args.protocols:
+                continue
+            proxy = proxies[mock]
+            transport = create(f"http://127.0.0.1:{proxy.port}")
+            padding = "x" * max(0, args.message_size - 12)
+            transport.fetch_reply(f"warm-up {padding}")
+            proxy.reset()
+            latencies = []
+            for i in range(args.messages):
+                start = time.perf_counter()
+                transport.fetch_reply(f"message {i:>4} {padding}")
+                latencies.append(time.perf_counter() - start)
+            up, down = proxy.up / args.messages, proxy.down / args.messages
+            first = baseline.setdefault(protocol, up + down)
+            print(
+                f"{protocol:<9} {name:<8} {up:>9.0f} {down:>11.0f} {(up + down) / first:>14.2f}x"
+                f" {1000 * percentile(latencies, 50):>8.2f} {1000 * percentile(latencies, 99):>8.2f}"
+            )
+            if protocol == "socketio":
+                for client in transport.clients:
+                    client.disconnect()
+    finally:
+        for proxy in proxies.values():
+            proxy.close()
+        stop_processes(*mocks.values())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"""Helpers used by app.py: transports, dispatch, history, metrics and settings."""
@@ -0,0 +1,241 @@
+"""Conversation history with a bounded in-memory tail.
+
+A Conversation keeps its newest CONVERSATION_HOT_TAIL messages in memory and
+appends every message to a ConversationStore on local disk, from which older
+pages are read back only when they are drawn ("Load earlier"). With
+CONVERSATION_STORE=memory (the default) nothing goes to disk and the whole
+history stays in memory, as before.
+"""
+import array
+import collections
+import hashlib
+import itertools
+import json
+import os
+import sqlite3
+import sys
+import threading
+
+# "memory", "sqlite" or "jsonl"
+CONVERSATION_STORE = os.getenv("CONVERSATION_STORE", "memory")
+CONVERSATION_STORE_PATH = os.getenv("CONVERSATION_STORE_PATH", os.path.join(".cache", "conversations"))
+# Newest messages kept in memory per conversation when a disk store is used
+CONVERSATION_HOT_TAIL = int(os.getenv("CONVERSATION_HOT_TAIL", "100"))
+
+
+class ChatMessage:
+    """One chat message. Role names are interned, since a handful repeat across every conversation."""
+
+    __slots__ = ("role", "content")
+
+    def __init__(self, role, content):
+        self.role = sys.intern(role)
+        self.content = content
+
+    def __eq__(self, other):
+        return isinstance(other, ChatMessage) and (self.role, self.content) == (other.role, other.content)
+
+    def __repr__(self):
+        return f"ChatMessage({self.role!r}, {self.content!r})"
+
+
+def chain_hash(state, message):
+    """Fold one message into a running conversation hash (see Conversation.state_hash)."""
+    entry = json.dumps([message.role, message.content], ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(state.encode("ascii") + entry).hexdigest()
+
+
+EMPTY_STATE_HASH = hashlib.sha256(b"").hexdigest()
+
+
+class ConversationStore:
+    """Append-only message log, keyed by conversation."""
+
+    def append(self, key, message):
+        raise NotImplementedError
+
+    def read(self, key, start, stop):
+        """Messages [start, stop) of conversation `key`, oldest first."""
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+
+class SqliteConversationStore(ConversationStore):
+    """All conversations in one SQLite file, shared by every session of the process."""
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS messages ("
+            " conversation TEXT NOT NULL, seq INTEGER NOT NULL, role TEXT NOT NULL, content TEXT NOT NULL,"
+            " PRIMARY KEY (conversation, seq)) WITHOUT ROWID"
+        )
+        self.next_seq = {}
+
+    def append(self, key, message):
+        with self.lock:
+            seq = self.next_seq.get(key)
+            if seq is None:
+                row = self.db.execute("SELECT COUNT(*) FROM messages WHERE conversation = ?", (key,)).fetchone()
+                seq = row[0]
+            self.db.execute(
+                "INSERT INTO messages (conversation, seq, role, content) VALUES (?, ?, ?, ?)",
+                (key, seq, message.role, message.content),
+            )
+            self.next_seq[key] = seq + 1
+
+    def read(self, key, start, stop):
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT role, content FROM messages WHERE conversation = ? AND seq >= ? AND seq < ? ORDER BY seq",
+                (key, start, stop),
+            ).fetchall()
+        return [ChatMessage(role, content) for role, content in rows]
+
+    def delete(self, key):
+        with self.lock:
+            self.db.execute("DELETE FROM messages WHERE conversation = ?", (key,))
+            self.next_seq.pop(key, None)
+
+
+class JsonlConversationStore(ConversationStore):
+    """One JSON-lines file per conversation in a directory."""
+
+    # A byte offset is remembered every INDEX_STRIDE lines, so a page read
+    # seeks close to its start without keeping an offset per message
+    INDEX_STRIDE = 64
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.index = {}  # key -> (message count, array of offsets of lines 0, STRIDE, 2*STRIDE, ...)
+
+    def path_for(self, key):
+        name = hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.directory, name + ".jsonl")
+
+    def append(self, key, message):
+        line = json.dumps([message.role, message.content], ensure_ascii=False).encode("utf-8") + b"\n"
+        with self.lock:
+            count, offsets = self.index.get(key) or (0, array.array("q"))
+            with open(self.path_for(key), "ab") as f:
+                offset = f.tell()
+                f.write(line)
+            if count % self.INDEX_STRIDE == 0:
+                offsets.append(offset)
+            self.index[key] = (count + 1, offsets)
+
+    def read(self, key, start, stop):
+        with self.lock:
+            count, offsets = self.index.get(key) or (0, array.array("q"))
+            stop = min(stop, count)
+            if start >= stop:
+                return []
+            block = start // self.INDEX_STRIDE
+            messages = []
+            with open(self.path_for(key), "rb") as f:
+                f.seek(offsets[block])
+                for line_no in range(block * self.INDEX_STRIDE, stop):
+                    line = f.readline()
+                    if line_no >= start:
+                        role, content = json.loads(line)
+                        messages.append(ChatMessage(role, content))
+        return messages
+
+    def delete(self, key):
+        with self.lock:
+            self.index.pop(key, None)
+            try:
+                os.remove(self.path_for(key))
+            except FileNotFoundError:
+                pass
+
+
+def create_conversation_store(kind=CONVERSATION_STORE, path=CONVERSATION_STORE_PATH):
+    """The store selected by CONVERSATION_STORE, or None for "memory"."""
+    if kind == "memory":
+        return None
+    if kind == "sqlite":
+        return SqliteConversationStore(os.path.join(path, "conversations.sqlite3"))
+    if kind == "jsonl":
+        return JsonlConversationStore(path)
+    raise ValueError(f"Unknown CONVERSATION_STORE: {kind!r}")
+
+
+class Conversation:
+    """List-like chat history: len(), indexing, slicing and iteration over ChatMessages.
+
+    Without a store every message stays in memory. With one, only the newest
+    `hot_size` messages do, and reads that reach further back go to the store.
+    `state_hash` identifies the whole conversation so far without reading it back.
+    """
+
+    def __init__(self, store=None, key=None, hot_size=CONVERSATION_HOT_TAIL):
+        self.store = store
+        self.key = key
+        if store is not None:
+            store.delete(key)  # a new conversation never continues a stale log
+        # A plain list when everything stays in memory, so slicing the newest
+        # messages does not walk the whole history
+        self.tail = [] if store is None else collections.deque(maxlen=hot_size)
+        self.length = 0
+        self.state_hash = EMPTY_STATE_HASH
+
+    def append(self, message):
+        if self.store is not None:
+            self.store.append(self.key, message)
+        self.tail.append(message)
+        self.length += 1
+        self.state_hash = chain_hash(self.state_hash, message)
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self.length)
+            if step != 1:
+                return self[start:stop][::step]
+            if start >= stop:
+                return []
+            tail_start = self.length - len(self.tail)
+            if start >= tail_start:
+                return self.tail_slice(start - tail_start, stop - tail_start)
+            older = self.store.read(self.key, start, min(stop, tail_start))
+            return older + self.tail_slice(0, max(0, stop - tail_start))
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError("conversation index out of range")
+        return self[index:index + 1][0]
+
+    def tail_slice(self, start, stop):
+        if isinstance(self.tail, list):
+            return self.tail[start:stop]
+        return list(itertools.islice(self.tail, start, stop))
+
+    def __iter__(self):
+        # Page through the store so a long history is never loaded all at once
+        page = getattr(self.tail, "maxlen", None) or len(self.tail) or 1
+        for start in range(0, self.length, page):
+            yield from self[start:start + page]
+
+    def spill(self):
+        """Free the in-memory tail of a store-backed conversation; reads go to the store until it refills."""
+        if self.store is not None:
+            self.tail.clear()
+
+    def close(self):
+        """Drop the on-disk copy (and the in-memory tail) once the conversation is no longer needed."""
+        if self.store is not None:
+            self.store.delete(self.key)
+        self.tail.clear()
+        self.length = 0
+        self.state_hash = EMPTY_STATE_HASH
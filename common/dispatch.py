@@ -0,0 +1,180 @@
+"""Backend calls run off the Streamlit script thread.
+
+A chat turn is submitted to a process-wide, bounded thread pool and tracked
+in session state as a Turn. The script run returns immediately; the app
+reruns the session when the turn's future is done (a fragment polls it as
+a fallback). When more turns are in flight than DISPATCH_MAX_PENDING, new
+ones are rejected instead of queueing behind a slow backend.
+
+Turns submitted with the same ordering key (one per story of a session)
+run one after another in submission order; turns with different keys run
+concurrently. Submitting the same message again under a key whose latest
+turn for it is still in flight (a double submit) returns that turn instead
+of sending it twice.
+
+Transports that get replies pushed to them (Socket.IO) do not need a worker
+per turn: they admit a Turn with track() and resolve its future themselves.
+"""
+import collections
+import os
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError, ThreadPoolExecutor
+
+from common.metrics import PENDING_TURNS
+from common.streaming import ChunkChannel
+
+# Backend calls running at once, across all sessions of the process
+DISPATCH_WORKERS = int(os.getenv("DISPATCH_WORKERS", "8"))
+# Turns admitted at once (running plus waiting for a worker); more are rejected
+DISPATCH_MAX_PENDING = int(os.getenv("DISPATCH_MAX_PENDING", "32"))
+
+
+class DispatcherBusy(Exception):
+    """Raised when a turn is submitted while DISPATCH_MAX_PENDING turns are in flight."""
+
+
+class TurnCancelled(Exception):
+    """Raised inside a cancelled turn's chunk callback to stop its stream."""
+
+
+class Turn:
+    """One chat turn in flight: the backend call's future plus the text streamed so far."""
+
+    def __init__(self, message, cache_key=None, timeout=None):
+        self.message = message
+        self.cache_key = cache_key
+        self.future = None
+        self.chunks = ChunkChannel()  # text streamed so far
+        self.cancelled = False
+        self.started = time.monotonic()
+        self.finished = None
+        # Only for tracked turns; submitted ones are bounded by their client's timeouts
+        self.deadline = self.started + timeout if timeout else None
+
+    def attach(self, future):
+        self.future = future
+        future.add_done_callback(self._on_done)
+
+    def _on_done(self, future):
+        self.finished = time.monotonic()
+
+    def streamed(self):
+        """(name, text) of the reply streamed so far; call from the script thread."""
+        return self.chunks.drain()
+
+    def add_chunk(self, name, delta):
+        # Runs on the worker (or transport) thread
+        if self.cancelled:
+            raise TurnCancelled()
+        self.chunks.put(name, delta)
+
+    def cancel(self):
+        # A running call cannot be interrupted: its result is ignored, and a
+        # stream stops at its next chunk
+        self.cancelled = True
+        self.future.cancel()
+
+    def done(self):
+        if self.deadline is not None and time.monotonic() > self.deadline and not self.future.done():
+            try:
+                self.future.set_exception(TimeoutError(f"no reply within {self.deadline - self.started:g}s"))
+            except InvalidStateError:
+                pass  # resolved in the meantime
+        return self.future.done()
+
+    def result(self):
+        return self.future.result()
+
+
+class TurnDispatcher:
+    def __init__(self, max_workers=DISPATCH_WORKERS, max_pending=DISPATCH_MAX_PENDING):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="chat-dispatch")
+        self.max_pending = max_pending
+        self.lock = threading.Lock()
+        self.pending = 0
+        # ordering key -> (turn, fn) waiting behind that key's running turn;
+        # a key is present while one of its turns is queued or running
+        self.waiting = {}
+        self.latest = {}  # ordering key -> its most recently submitted Turn
+
+    def submit(self, fn, message, cache_key=None, key=None):
+        """Run `fn(message, turn.add_chunk)` on the pool and return its Turn.
+
+        `fn` runs off the script thread, so it must not touch st.session_state
+        or draw elements; it should raise on failure. With a `key`, it starts
+        only after every earlier turn with the same key has finished, and a
+        duplicate of the key's latest turn still in flight returns that turn.
+        """
+        with self.lock:
+            latest = self.latest.get(key)
+            if latest is not None and latest.message == message and not latest.cancelled and not latest.future.done():
+                return latest
+        self.admit()
+        turn = Turn(message, cache_key)
+        turn.attach(Future())
+        turn.future.add_done_callback(self.release)
+        with self.lock:
+            if key is not None:
+                self.latest[key] = turn
+            if key is not None and key in self.waiting:
+                self.waiting[key].append((turn, fn))
+                return turn
+            if key is not None:
+                self.waiting[key] = collections.deque()
+        self.executor.submit(self._run, key, turn, fn)
+        return turn
+
+    def _run(self, key, turn, fn):
+        # Skipped if the turn was cancelled (superseded) while it waited
+        if turn.future.set_running_or_notify_cancel():
+            try:
+                result = fn(turn.message, turn.add_chunk)
+            except BaseException as e:
+                turn.future.set_exception(e)
+            else:
+                turn.future.set_result(result)
+        if key is None:
+            return
+        with self.lock:
+            queued = self.waiting[key]
+            if not queued:
+                del self.waiting[key]
+                del self.latest[key]
+                return
+            next_turn, next_fn = queued.popleft()
+        self.executor.submit(self._run, key, next_turn, next_fn)
+
+    def track(self, message, cache_key=None, timeout=None):
+        """Admit a Turn whose future the caller resolves, without using a worker.
+
+        The future fails with TimeoutError if it is still pending `timeout`
+        seconds later (checked whenever the turn is polled).
+        """
+        self.admit()
+        turn = Turn(message, cache_key, timeout)
+        turn.attach(Future())
+        turn.future.add_done_callback(self.release)
+        return turn
+
+    def adopt(self, message, future, cache_key=None):
+        """Admit a Turn for a backend call already running elsewhere (e.g. a
+        prefetch), resolved by its `future`.
+        """
+        self.admit()
+        turn = Turn(message, cache_key)
+        turn.attach(future)
+        future.add_done_callback(self.release)
+        return turn
+
+    def admit(self):
+        with self.lock:
+            if self.pending >= self.max_pending:
+                raise DispatcherBusy(f"{self.pending} chat turns already in flight")
+            self.pending += 1
+            PENDING_TURNS.set(self.pending)
+
+    def release(self, future):
+        with self.lock:
+            self.pending -= 1
+            PENDING_TURNS.set(self.pending)
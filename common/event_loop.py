@@ -0,0 +1,34 @@
+"""A long-lived asyncio event loop for code running in Streamlit script threads."""
+import asyncio
+import concurrent.futures
+import threading
+
+
+class BackgroundLoop:
+    """Runs an event loop forever in a daemon thread.
+
+    Streamlit script runs are synchronous; submitting coroutines here instead
+    of wrapping each call in ``asyncio.run`` lets async clients (and their
+    connection pools) live across reruns and be shared by every session.
+    """
+
+    def __init__(self, name="background-loop"):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name=name, daemon=True)
+        self.thread.start()
+
+    def submit(self, coro):
+        """Schedule `coro` on the loop and return a concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout=None):
+        """Run `coro` on the loop and block the calling thread for its result.
+
+        On timeout the coroutine is cancelled before the TimeoutError propagates.
+        """
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
@@ -0,0 +1,145 @@
+"""On-disk cache of the backend's GraphQL schema.
+
+Lets the GraphQL client validate requests against the backend schema without
+sending an introspection query every time a process starts.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+import httpx
+from graphql import build_client_schema, get_introspection_query, print_schema
+
+from common.logs import get_logger
+
+# "cache":   use the cached SDL and refresh it in the background; introspect
+#            synchronously only when there is no cache yet (default)
+# "offline": never introspect; a cached SDL must already exist
+# "live":    introspect on every start, like fetch_schema_from_transport=True
+GRAPHQL_SCHEMA_MODE = os.getenv("GRAPHQL_SCHEMA_MODE", "cache")
+GRAPHQL_SCHEMA_CACHE = os.getenv("GRAPHQL_SCHEMA_CACHE", os.path.join(".cache", "graphql_schema.graphql"))
+
+# Bump when the cache layout changes so old files are ignored
+CACHE_FORMAT_VERSION = 1
+
+logger = get_logger(__name__)
+
+
+def sdl_hash(sdl):
+    return hashlib.sha256(sdl.encode("utf-8")).hexdigest()
+
+
+def write_atomically(path, text):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+class SchemaCache:
+    """SDL file plus a JSON sidecar holding its endpoint, hash and ETag."""
+
+    def __init__(self, url, path=GRAPHQL_SCHEMA_CACHE):
+        self.url = url
+        self.path = path
+        self.meta_path = path + ".json"
+
+    def read_meta(self):
+        try:
+            with open(self.meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get("format") != CACHE_FORMAT_VERSION or meta.get("url") != self.url:
+            return None
+        return meta
+
+    def load(self):
+        """Return the cached SDL for this endpoint, or None."""
+        meta = self.read_meta()
+        if meta is None:
+            return None
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                sdl = f.read()
+        except OSError:
+            return None
+        if sdl_hash(sdl) != meta.get("sha256"):
+            return None  # half-written or edited by hand
+        return sdl
+
+    def save(self, sdl, etag=None):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        meta = {
+            "format": CACHE_FORMAT_VERSION,
+            "url": self.url,
+            "sha256": sdl_hash(sdl),
+            "etag": etag,
+            "fetched_at": time.time(),
+        }
+        write_atomically(self.path, sdl)
+        write_atomically(self.meta_path, json.dumps(meta, indent=2))
+
+    def fetch(self, etag=None, timeout=10):
+        """Introspect the endpoint.
+
+        Returns (sdl, etag), or None when the server answers 304 Not Modified
+        to the ETag of the cached copy.
+        """
+        headers = {"If-None-Match": etag} if etag else {}
+        response = httpx.post(self.url, json={"query": get_introspection_query()}, headers=headers, timeout=timeout)
+        if response.status_code == 304:
+            return None
+        response.raise_for_status()
+        sdl = print_schema(build_client_schema(response.json()["data"]))
+        return sdl, response.headers.get("ETag")
+
+    def refresh(self):
+        """Introspect and update the cache; return the SDL if it changed, else None."""
+        meta = self.read_meta() or {}
+        fetched = self.fetch(etag=meta.get("etag"))
+        if fetched is None:
+            return None
+        sdl, etag = fetched
+        self.save(sdl, etag)
+        return sdl if sdl_hash(sdl) != meta.get("sha256") else None
+
+
+def refresh_in_background(cache, on_change):
+    """Revalidate `cache` on a daemon thread, calling `on_change(sdl)` if the schema moved."""
+
+    def refresh():
+        try:
+            new_sdl = cache.refresh()
+        except Exception as e:
+            logger.warning("GraphQL schema refresh failed, keeping cached schema: %s", e)
+            return
+        if new_sdl is not None:
+            on_change(new_sdl)
+
+    threading.Thread(target=refresh, name="graphql-schema-refresh", daemon=True).start()
+
+
+def load_client_schema(url, mode=GRAPHQL_SCHEMA_MODE, cache=None):
+    """Return (sdl, refresh) for building a gql Client.
+
+    `sdl` is None in "live" mode, meaning the client should fetch the schema
+    from the transport itself. `refresh` is set only when the SDL came from the
+    cache in "cache" mode: call `refresh(on_change)` once the client exists to
+    revalidate it in the background.
+    """
+    if mode == "live":
+        return None, None
+    cache = cache or SchemaCache(url)
+    sdl = cache.load()
+    if mode == "offline":
+        if sdl is None:
+            raise RuntimeError(f"GRAPHQL_SCHEMA_MODE=offline but no cached schema at {cache.path}")
+        return sdl, None
+    if sdl is None:
+        sdl, etag = cache.fetch()
+        cache.save(sdl, etag)
+        return sdl, None
+    return sdl, lambda on_change: refresh_in_background(cache, on_change)
@@ -0,0 +1,34 @@
+"""Windowed rendering of the chat history.
+
+Only the last HISTORY_WINDOW messages are drawn; older ones collapse into a
+"Load earlier" control. The history is a fragment, so loading earlier
+messages reruns just the history instead of the whole app.
+"""
+import os
+
+import streamlit as st
+
+from common.metrics import MESSAGE_RENDER_SECONDS
+
+# Messages drawn on each rerun, and how many more every "Load earlier" click adds
+HISTORY_WINDOW = int(os.getenv("HISTORY_WINDOW", "50"))
+
+
+def show_earlier_messages(window):
+    st.session_state.history_shown += window
+
+
+@st.fragment
+def render_history(messages, window=HISTORY_WINDOW):
+    if "history_shown" not in st.session_state:
+        st.session_state.history_shown = window
+
+    hidden = max(0, len(messages) - st.session_state.history_shown)
+    if hidden:
+        st.caption(f"{hidden} earlier message{'s' if hidden != 1 else ''} hidden")
+        st.button("Load earlier", key="load_earlier_messages", on_click=show_earlier_messages, args=(window,))
+
+    # Slicing keeps each rerun O(visible) rather than O(conversation length)
+    for message in messages[hidden:]:
+        with MESSAGE_RENDER_SECONDS.time(), st.chat_message(message.role):
+            st.markdown(message.content)
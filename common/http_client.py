@@ -0,0 +1,78 @@
+"""Pooled, keep-alive HTTP clients for the REST backend."""
+import gzip
+import json
+import os
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Keep-alive connections held open to the backend, per process
+REST_POOL_MAXSIZE = int(os.getenv("REST_POOL_MAXSIZE", "20"))
+# When the pool is exhausted, wait for a free connection instead of opening
+# (and then discarding) an extra one
+REST_POOL_BLOCK = os.getenv("REST_POOL_BLOCK", "true").lower() in ("1", "true", "yes")
+REST_CONNECT_TIMEOUT = float(os.getenv("REST_CONNECT_TIMEOUT", "3.05"))
+REST_READ_TIMEOUT = float(os.getenv("REST_READ_TIMEOUT", "10"))
+# (connect, read) tuple as accepted by requests
+REST_TIMEOUT = (REST_CONNECT_TIMEOUT, REST_READ_TIMEOUT)
+# Opt-in body compression: off, gzip or br (needs the brotli package). Request
+# bodies are compressed with it (the backend must accept Content-Encoding) and
+# it is asked for first in Accept-Encoding.
+REST_COMPRESSION = os.getenv("REST_COMPRESSION", "off").lower()
+# Request bodies smaller than this are sent uncompressed
+REST_COMPRESS_MIN_BYTES = int(os.getenv("REST_COMPRESS_MIN_BYTES", "1024"))
+
+
+def create_http_session(pool_maxsize=REST_POOL_MAXSIZE, pool_block=REST_POOL_BLOCK):
+    """A requests.Session whose connections are reused across calls and threads."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_maxsize=pool_maxsize, pool_block=pool_block, max_retries=0)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def create_async_http_client(max_connections=REST_POOL_MAXSIZE):
+    """An httpx.AsyncClient with the same limits, for use on a single event loop."""
+    import httpx  # only needed with REST_ASYNC_CLIENT
+
+    return httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        timeout=httpx.Timeout(REST_READ_TIMEOUT, connect=REST_CONNECT_TIMEOUT),
+    )
+
+
+def _brotli():
+    import brotli  # only needed with REST_COMPRESSION=br
+
+    return brotli
+
+
+# Content-Encoding -> (compress, Accept-Encoding); "off" leaves the client's default
+COMPRESSORS = {
+    "gzip": (lambda body: gzip.compress(body, compresslevel=6), "gzip"),
+    "br": (lambda body: _brotli().compress(body, quality=5), "br, gzip"),
+}
+
+
+class BodyEncoder:
+    """Serializes JSON request bodies, compressing those over `min_bytes`."""
+
+    def __init__(self, compression=REST_COMPRESSION, min_bytes=REST_COMPRESS_MIN_BYTES):
+        if compression not in ("off", "none", "") and compression not in COMPRESSORS:
+            raise ValueError(f"Unknown REST_COMPRESSION {compression!r}, expected off, {', '.join(COMPRESSORS)}")
+        self.compression = compression if compression in COMPRESSORS else None
+        self.min_bytes = min_bytes
+        self.headers = {"Content-Type": "application/json"}
+        if self.compression is not None:
+            compress, accept = COMPRESSORS[self.compression]
+            compress(b"")  # fail on a missing brotli package now, not on the first message
+            self.headers["Accept-Encoding"] = accept
+
+    def encode(self, payload):
+        """(body bytes, headers) for `payload`."""
+        body = json.dumps(payload, separators=(",", ":")).encode()
+        if self.compression is None or len(body) < self.min_bytes:
+            return body, self.headers
+        compress, _ = COMPRESSORS[self.compression]
+        return compress(body), {**self.headers, "Content-Encoding": self.compression}
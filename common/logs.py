@@ -0,0 +1,76 @@
+"""Leveled, rate-limited logging for the chat apps.
+
+Every rerun used to print its debug lines to stdout, which costs I/O on the
+script thread under load. Messages now go through the "chat" logger at
+LOG_LEVEL (default INFO, so per-rerun DEBUG lines are skipped before they are
+formatted). Lines repeated within LOG_RATE_LIMIT seconds are dropped, and
+the next line that gets through reports how many were suppressed. DEBUG
+lines count as repeats when they share a message template, so per-rerun
+lines are written once per interval whatever their arguments. From INFO up,
+only the exact same line is a repeat, so distinct events and errors are
+always written.
+"""
+import logging
+import os
+import threading
+import time
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Seconds between two repeats of a record (see above); 0 disables the limit
+LOG_RATE_LIMIT = float(os.getenv("LOG_RATE_LIMIT", "5"))
+
+
+class RateLimitFilter(logging.Filter):
+    """Lets a repeated record through at most once per `interval` seconds.
+
+    DEBUG records repeat when their template matches, higher levels when
+    their formatted message does.
+    """
+
+    # Keys kept before the ones older than `interval` are pruned
+    max_keys = 1024
+
+    def __init__(self, interval=LOG_RATE_LIMIT):
+        super().__init__()
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.last = {}  # key -> [time last let through, suppressed since]
+
+    def filter(self, record):
+        if self.interval <= 0:
+            return True
+        if record.levelno < logging.INFO:
+            key = (record.name, record.msg)
+        else:
+            key = (record.name, record.levelno, record.getMessage())
+        now = time.monotonic()
+        with self.lock:
+            if len(self.last) >= self.max_keys:
+                self.last = {k: v for k, v in self.last.items() if now - v[0] < self.interval}
+            entry = self.last.get(key)
+            if entry is not None and now - entry[0] < self.interval:
+                entry[1] += 1
+                return False
+            suppressed = entry[1] if entry is not None else 0
+            self.last[key] = [now, 0]
+        if suppressed:
+            record.msg = f"{record.msg} ({suppressed} similar suppressed)"
+        return True
+
+
+def _configure_root():
+    root = logging.getLogger("chat")
+    if not root.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+        handler.addFilter(RateLimitFilter())
+        root.addHandler(handler)
+        root.setLevel(LOG_LEVEL)
+        root.propagate = False
+    return root
+
+
+def get_logger(name):
+    """Return a logger under the shared "chat" logger, e.g. get_logger(__name__)."""
+    _configure_root()
+    return logging.getLogger(f"chat.{name}")
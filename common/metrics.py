@@ -0,0 +1,242 @@
+"""In-process metrics for the chat apps, exported in the Prometheus text format.
+
+Metrics live in one registry per process, shared by all sessions. They can be
+scraped from a small HTTP endpoint (METRICS_PORT) and/or written to a file
+every METRICS_FILE_INTERVAL seconds (METRICS_FILE), e.g. for node_exporter's
+textfile collector. Both are off by default; recording is always on and costs
+a lock and a bisect per observation.
+"""
+import bisect
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from common.logs import get_logger
+
+# Port of the /metrics endpoint; 0 disables it
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+# File the metrics are periodically written to; empty disables it
+METRICS_FILE = os.getenv("METRICS_FILE", "")
+METRICS_FILE_INTERVAL = float(os.getenv("METRICS_FILE_INTERVAL", "15"))
+
+# Upper bounds in seconds, as used by the Prometheus client libraries
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# For work that normally takes well under a millisecond
+FAST_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+# For counts of queued items
+COUNT_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+logger = get_logger(__name__)
+
+
+class Timer:
+    """Observes the seconds since it was created, once, on stop() or on leaving a with block."""
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+        self.start = time.perf_counter()
+        self.elapsed = None
+
+    def stop(self):
+        if self.elapsed is None:
+            self.elapsed = time.perf_counter() - self.start
+            self.histogram.observe(self.elapsed)
+        return self.elapsed
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class Histogram:
+    def __init__(self, name, help, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self.lock = threading.Lock()
+        self.counts = [0] * (len(self.buckets) + 1)  # last one is +Inf
+        self.sum = 0.0
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def time(self):
+        return Timer(self)
+
+    def render(self):
+        with self.lock:
+            counts, total = list(self.counts), self.sum
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(float(bound))
+            lines.append(f'{self.name}_bucket{{le="{le}"}} {cumulative}')
+        lines.append(f"{self.name}_sum {total}")
+        lines.append(f"{self.name}_count {cumulative}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self.lock = threading.Lock()
+        self.value = 0.0
+
+    def set(self, value):
+        with self.lock:
+            self.value = value
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def render(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {self.value}"]
+
+
+class Counter:
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self.lock = threading.Lock()
+        self.value = 0
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+    def render(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter", f"{self.name} {self.value}"]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def _register(self, metric):
+        with self.lock:
+            # Registering a name twice returns the existing metric
+            return self.metrics.setdefault(metric.name, metric)
+
+    def histogram(self, name, help, buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help, buckets))
+
+    def gauge(self, name, help):
+        return self._register(Gauge(name, help))
+
+    def counter(self, name, help):
+        return self._register(Counter(name, help))
+
+    def render(self):
+        with self.lock:
+            metrics = list(self.metrics.values())
+        return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# --- Metrics recorded by the apps ---
+RERUN_SECONDS = REGISTRY.histogram("chat_rerun_seconds", "Wall time of a full script run.")
+BACKEND_RTT_SECONDS = REGISTRY.histogram(
+    "chat_backend_rtt_seconds", "Time from sending a chat message to receiving its complete reply."
+)
+PARSE_SECONDS = REGISTRY.histogram(
+    "chat_response_parse_seconds", "Time to turn a reply into history messages and answer options.",
+    buckets=FAST_BUCKETS,
+)
+MESSAGE_RENDER_SECONDS = REGISTRY.histogram(
+    "chat_message_render_seconds", "Time to draw one history message.",
+    buckets=FAST_BUCKETS,
+)
+PENDING_TURNS = REGISTRY.gauge("chat_pending_turns", "Chat turns waiting for their reply, across all sessions.")
+REPLY_PICKUP_SECONDS = REGISTRY.histogram(
+    "chat_reply_pickup_seconds", "Time from a reply arriving to a rerun adding it to the history."
+)
+
+STREAM_QUEUE_DEPTH = REGISTRY.histogram(
+    "chat_stream_queue_depth", "Streamed chunks waiting for a reply's redraw, per redraw that found any.",
+    buckets=COUNT_BUCKETS,
+)
+STREAM_COALESCED_TOTAL = REGISTRY.counter(
+    "chat_stream_coalesced_total", "Times a full stream buffer was merged into one chunk instead of growing."
+)
+BACKEND_RETRIES_TOTAL = REGISTRY.counter("chat_backend_retries_total", "Backend requests retried after a failure.")
+BACKEND_HEDGES_TOTAL = REGISTRY.counter("chat_backend_hedges_total", "Hedge requests sent because the first attempt was slow.")
+BACKEND_HEDGE_WINS_TOTAL = REGISTRY.counter("chat_backend_hedge_wins_total", "Hedge requests that answered before the first attempt.")
+BACKEND_REJECTED_TOTAL = REGISTRY.counter("chat_backend_rejected_total", "Backend requests failed fast by an open circuit breaker.")
+OPEN_CIRCUITS = REGISTRY.gauge("chat_backend_open_circuits", "Backend endpoints whose circuit breaker is open or half-open.")
+SESSIONS = REGISTRY.gauge("chat_sessions", "Sessions known to the session registry, open tabs and recently closed ones.")
+IDLE_SESSIONS = REGISTRY.gauge("chat_idle_sessions", "Open sessions idle for longer than SESSION_IDLE_TTL.")
+CLOSED_SESSIONS = REGISTRY.gauge("chat_closed_sessions", "Sessions whose tab is gone, kept until SESSION_CLOSED_TTL.")
+SESSIONS_RECLAIMED_TOTAL = REGISTRY.counter("chat_sessions_reclaimed_total", "Closed sessions whose resources were released.")
+PROCESS_THREADS = REGISTRY.gauge("chat_process_threads", "Live threads in the process.")
+PROCESS_SOCKETS = REGISTRY.gauge("chat_process_sockets", "Open socket file descriptors in the process (Linux only).")
+
+
+# --- Export ---
+class MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # one line per scrape is noise
+
+
+def serve_metrics(port, registry=REGISTRY):
+    handler = type("Handler", (MetricsHandler,), {"registry": registry})
+    server = ThreadingHTTPServer(("", port), handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+def write_metrics_periodically(path, interval, registry=REGISTRY):
+    def run():
+        while True:
+            time.sleep(interval)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    f.write(registry.render())
+                os.replace(tmp_path, path)
+            except OSError as e:
+                logger.warning("Could not write metrics to %s: %s", path, e)
+
+    thread = threading.Thread(target=run, name="metrics-file", daemon=True)
+    thread.start()
+    return thread
+
+
+def start_metrics_export(port=METRICS_PORT, path=METRICS_FILE, interval=METRICS_FILE_INTERVAL):
+    """Start the configured exporters; call once per process."""
+    server = None
+    if port:
+        try:
+            server = serve_metrics(port)
+            logger.info("Serving metrics on port %s", port)
+        except OSError as e:
+            logger.warning("Could not serve metrics on port %s: %s", port, e)
+    if path:
+        write_metrics_periodically(path, interval)
+    return server
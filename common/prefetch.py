@@ -0,0 +1,56 @@
+"""Speculative prefetch of replies to offered answer options.
+
+While the option buttons are on screen, the reply to every option is requested
+in the background so the one that gets clicked can render immediately. The
+replies to the other options are discarded.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from common.logs import get_logger
+
+# Opt-in: prefetching sends one backend request per offered option
+PREFETCH_OPTIONS = os.getenv("PREFETCH_OPTIONS", "false").lower() in ("1", "true", "yes")
+# Prefetch requests in flight at once, across all sessions of the process
+PREFETCH_CONCURRENCY = int(os.getenv("PREFETCH_CONCURRENCY", "4"))
+
+logger = get_logger(__name__)
+
+
+class OptionPrefetcher:
+    """Runs prefetch requests on a bounded thread pool.
+
+    `fetch(option)` must be safe to call off the script thread: it may not
+    touch st.session_state or draw elements, and should raise on failure.
+    """
+
+    def __init__(self, max_workers=PREFETCH_CONCURRENCY):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="option-prefetch")
+
+    def prefetch(self, fetch, options):
+        """Start fetching every option; returns {option: Future}."""
+        return {option: self.executor.submit(fetch, option) for option in dict.fromkeys(options)}
+
+    @staticmethod
+    def take(futures, option):
+        """Return the prefetch Future for `option`, or None, and discard the rest.
+
+        The Future may still be running; the caller must not wait for it on
+        the script thread. A prefetch that already failed returns None, so
+        the click is sent normally.
+        """
+        future = futures.pop(option, None)
+        OptionPrefetcher.discard(futures)
+        if future is None:
+            return None
+        if future.done() and (future.cancelled() or future.exception() is not None):
+            logger.warning("Prefetch for '%s' failed, sending normally: %s", option, future.exception() if not future.cancelled() else "cancelled")
+            return None
+        return future
+
+    @staticmethod
+    def discard(futures):
+        # Queued requests are dropped; running ones finish and are ignored
+        for future in futures.values():
+            future.cancel()
+        futures.clear()
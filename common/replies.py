@@ -0,0 +1,196 @@
+"""Decoding and parsing of the backend's chat reply, shared by every transport.
+
+All protocols return the same body (GraphQL wraps it in `createChat`, which
+its transport unwraps):
+
+    {"answers": [{"name": ..., "message": ...}, ...] | {"name": ..., "message": ...},
+     "answerOptions": {"isNeeded": bool, "options": [str, ...]}}
+
+Transports that read the raw body (REST) hand it to decode_reply(), which
+validates it against that contract while decoding and returns a Reply. With
+msgspec installed the contract is a compiled schema and the answers are
+decoded straight into typed structs; with orjson (or the standard library)
+the body is decoded to dicts and walked. Transports whose client library
+decodes the body (GraphQL, Socket.IO) return dicts, which parse_reply()
+walks the same way.
+"""
+import json
+import os
+
+from common.conversation_store import ChatMessage
+from common.logs import get_logger
+from common.metrics import PARSE_SECONDS
+
+logger = get_logger(__name__)
+
+# JSON library for reply bodies: auto (msgspec, else orjson, else json), msgspec, orjson or json
+REPLY_DECODER = os.getenv("REPLY_DECODER", "auto").lower()
+
+
+class Reply:
+    """A decoded reply: history messages (blank answers dropped) and answer options."""
+
+    __slots__ = ("messages", "options")
+
+    def __init__(self, messages, options):
+        self.messages = tuple(messages)
+        self.options = tuple(options)
+
+    def __repr__(self):
+        return f"Reply({list(self.messages)!r}, {list(self.options)!r})"
+
+
+def _answer_message(name, message):
+    # None for answers without text, which are not shown
+    if message and message.strip():
+        return ChatMessage(name or 'assistant', message)
+    return None
+
+
+def _is_answer(item):
+    # The {name, message} contract; either may be null
+    return (
+        isinstance(item, dict) and 'name' in item and 'message' in item
+        and isinstance(item['name'], (str, type(None))) and isinstance(item['message'], (str, type(None)))
+    )
+
+
+def _reply_from_dict(data):
+    answers = data.get('answers') or []
+    answer_options = data.get('answerOptions') or {}
+
+    # Ensure answers is always a list for consistent processing
+    if not isinstance(answers, list):
+        answers = [answers]
+
+    messages = []
+    malformed = []
+    for item in answers:
+        if _is_answer(item):
+            message = _answer_message(item['name'], item['message'])
+            if message is not None:
+                messages.append(message)
+        else:
+            malformed.append(item)
+    if malformed:
+        # One line per reply, however many items were dropped
+        logger.warning(
+            "Dropped %d malformed item(s) of %d in answers array, first: %.200r",
+            len(malformed), len(answers), malformed[0],
+            extra={"malformed_answers": len(malformed), "answers": len(answers)},
+        )
+
+    options = []
+    if isinstance(answer_options, dict):
+        candidates = answer_options.get('options', [])
+        if answer_options.get('isNeeded', False) and isinstance(candidates, list) and candidates:
+            options = candidates
+            logger.debug("Extracted answerOptions: %s", options)
+    return Reply(messages, options)
+
+
+def parse_reply(data):
+    """Return (history messages, answer options) for a Reply or a reply body dict.
+
+    Answers with blank text are skipped; options are only returned when the
+    backend marks them as needed.
+    """
+    if isinstance(data, Reply):
+        return list(data.messages), list(data.options)
+    with PARSE_SECONDS.time():
+        reply = _reply_from_dict(data)
+    return list(reply.messages), list(reply.options)
+
+
+# --- Decoders ---
+# Each maps a raw body (bytes or str) to a Reply and raises ValueError if it
+# is not a JSON object.
+
+def _json_decoder(loads):
+    def decode(raw):
+        data = loads(raw)
+        if not isinstance(data, dict):
+            raise ValueError(f"Expected a JSON object, got {type(data).__name__}")
+        return _reply_from_dict(data)
+    return decode
+
+
+def _msgspec_decoder():
+    from typing import Optional, Union
+
+    import msgspec
+
+    # The {answers, answerOptions} contract; unknown fields are ignored
+    class Answer(msgspec.Struct):
+        name: Optional[str]
+        message: Optional[str]
+
+    class AnswerOptions(msgspec.Struct):
+        isNeeded: bool = False
+        options: Optional[list[str]] = None
+
+    class Body(msgspec.Struct):
+        answers: Union[list[Answer], Answer, None] = None
+        answerOptions: Optional[AnswerOptions] = None
+
+    typed = msgspec.json.Decoder(Body)
+    untyped = msgspec.json.Decoder()
+    fallback = _json_decoder(untyped.decode)
+
+    def decode(raw):
+        try:
+            body = typed.decode(raw)
+        except msgspec.ValidationError:
+            # Some item breaks the contract: decode again leniently, dropping
+            # only the malformed items
+            return fallback(raw)
+        except msgspec.DecodeError as e:
+            raise ValueError(str(e)) from e
+        answers = body.answers if isinstance(body.answers, list) else [body.answers] if body.answers else []
+        messages = [m for m in (_answer_message(a.name, a.message) for a in answers) if m is not None]
+        options = body.answerOptions
+        return Reply(messages, options.options or [] if options is not None and options.isNeeded else [])
+    return decode
+
+
+def _orjson_decoder():
+    import orjson
+
+    return _json_decoder(orjson.loads)
+
+
+DECODERS = {
+    "msgspec": _msgspec_decoder,
+    "orjson": _orjson_decoder,
+    "json": lambda: _json_decoder(json.loads),
+}
+
+
+def create_decoder(name=REPLY_DECODER):
+    """Return a function decoding a raw reply body into a Reply.
+
+    "auto" uses the first of msgspec and orjson that is installed, else the
+    standard library.
+    """
+    if name == "auto":
+        for candidate in ("msgspec", "orjson"):
+            try:
+                return DECODERS[candidate]()
+            except ImportError:
+                continue
+        return DECODERS["json"]()
+    if name not in DECODERS:
+        raise ValueError(f"Unknown REPLY_DECODER {name!r}; expected auto, {', '.join(DECODERS)}")
+    return DECODERS[name]()
+
+
+_decode = None
+
+
+def decode_reply(raw):
+    """Decode and validate a raw reply body (bytes or str) into a Reply."""
+    global _decode
+    if _decode is None:
+        _decode = create_decoder()
+    with PARSE_SECONDS.time():
+        return _decode(raw)
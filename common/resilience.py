@@ -0,0 +1,294 @@
+"""Tail-latency protection for request/response backends (REST, GraphQL).
+
+Every call to an endpoint goes through its BackendGuard, shared by all
+sessions of the process (see get_backend_guard):
+
+* Circuit breaker: after BACKEND_BREAKER_FAILURES failed attempts in a row,
+  calls fail fast with CircuitOpen for BACKEND_BREAKER_RESET seconds. Then a
+  single trial call is let through, and its outcome closes or reopens it.
+* Retries: an attempt that failed before the backend could have handled it
+  is retried up to BACKEND_RETRIES times after a jittered exponential
+  backoff, if the retry budget has a token left. Every call adds
+  BACKEND_RETRY_BUDGET tokens (up to BACKEND_RETRY_BUDGET_BURST), so a
+  failing backend sees at most that fraction of extra requests.
+* Hedging (opt-in, BACKEND_HEDGE): an attempt that has not answered within
+  the BACKEND_HEDGE_PERCENTILE of recent latencies gets a second, concurrent
+  attempt, and the first reply wins. Hedges draw on the same budget.
+
+Errors the transport reports as backend failures (connection errors,
+timeouts, 5xx) count toward the breaker; a 4xx or a cancelled turn means the
+backend answered. Only those it reports as retryable are retried: createChat
+is not idempotent, so by default that is a failed connect, a 502/503/504 from
+a gateway, or a circuit about to let a trial call through. A read timeout may
+mean the backend is still working on the message, and is only retried with
+BACKEND_RETRY_TIMEOUTS.
+"""
+import collections
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from common.logs import get_logger
+from common.metrics import (
+    BACKEND_HEDGE_WINS_TOTAL, BACKEND_HEDGES_TOTAL, BACKEND_REJECTED_TOTAL, BACKEND_RETRIES_TOTAL, OPEN_CIRCUITS,
+)
+
+# Retries per call after the first attempt; 0 disables retries
+BACKEND_RETRIES = int(os.getenv("BACKEND_RETRIES", "2"))
+# Backoff before retry n is uniform in [0, min(BACKOFF_MAX, BACKOFF * 2**(n-1))] seconds
+BACKEND_RETRY_BACKOFF = float(os.getenv("BACKEND_RETRY_BACKOFF", "0.1"))
+BACKEND_RETRY_BACKOFF_MAX = float(os.getenv("BACKEND_RETRY_BACKOFF_MAX", "2"))
+# Opt-in: also retry after a read timeout, which sends the message again to a
+# backend that may already be processing it
+BACKEND_RETRY_TIMEOUTS = os.getenv("BACKEND_RETRY_TIMEOUTS", "false").lower() in ("1", "true", "yes")
+# Retry (and hedge) tokens earned per call, and the most that can be saved up
+BACKEND_RETRY_BUDGET = float(os.getenv("BACKEND_RETRY_BUDGET", "0.1"))
+BACKEND_RETRY_BUDGET_BURST = float(os.getenv("BACKEND_RETRY_BUDGET_BURST", "10"))
+# Opt-in: hedging sends a duplicate request to a backend that may not expect one
+BACKEND_HEDGE = os.getenv("BACKEND_HEDGE", "false").lower() in ("1", "true", "yes")
+# Hedge after this percentile of recent successful latencies, but not sooner than MIN_DELAY
+BACKEND_HEDGE_PERCENTILE = float(os.getenv("BACKEND_HEDGE_PERCENTILE", "95"))
+BACKEND_HEDGE_MIN_DELAY = float(os.getenv("BACKEND_HEDGE_MIN_DELAY", "0.05"))
+# Hedge delay until enough latencies have been seen
+BACKEND_HEDGE_DEFAULT_DELAY = float(os.getenv("BACKEND_HEDGE_DEFAULT_DELAY", "1"))
+# Threads running hedged attempts, across all sessions (each hedged call uses up to two)
+BACKEND_HEDGE_WORKERS = int(os.getenv("BACKEND_HEDGE_WORKERS", "32"))
+# Failed attempts in a row that open the breaker, and seconds it stays open
+BACKEND_BREAKER_FAILURES = int(os.getenv("BACKEND_BREAKER_FAILURES", "5"))
+BACKEND_BREAKER_RESET = float(os.getenv("BACKEND_BREAKER_RESET", "30"))
+
+# Gateway answers that mean the request never reached a backend instance
+RETRYABLE_STATUS_CODES = (502, 503, 504)
+
+# Successful latencies kept for the hedge delay, and how many it needs
+LATENCY_WINDOW = 200
+LATENCY_MIN_SAMPLES = 20
+
+logger = get_logger(__name__)
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling an endpoint whose circuit breaker is open."""
+
+    def __init__(self, url, retry_in):
+        super().__init__(
+            f"The backend at {url} is failing, so requests are paused. Please try again in {max(retry_in, 1):.0f}s."
+        )
+        self.url = url
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """Closed, open or half-open; thread-safe."""
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+
+    def __init__(self, url, failure_threshold=BACKEND_BREAKER_FAILURES, reset_timeout=BACKEND_BREAKER_RESET):
+        self.url = url
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.lock = threading.Lock()
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_running = False
+
+    def before_call(self):
+        """Raise CircuitOpen unless an attempt may be sent now."""
+        with self.lock:
+            if self.state == self.OPEN:
+                retry_in = self.opened_at + self.reset_timeout - time.monotonic()
+                if retry_in > 0:
+                    BACKEND_REJECTED_TOTAL.inc()
+                    raise CircuitOpen(self.url, retry_in)
+                self.state = self.HALF_OPEN
+                self.trial_running = False
+            if self.state == self.HALF_OPEN:
+                if self.trial_running:
+                    BACKEND_REJECTED_TOTAL.inc()
+                    raise CircuitOpen(self.url, 0)
+                self.trial_running = True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            if self.state != self.CLOSED:
+                logger.info("Circuit for %s closed", self.url)
+                self.state = self.CLOSED
+                OPEN_CIRCUITS.dec()
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+                if self.state == self.CLOSED:
+                    OPEN_CIRCUITS.inc()
+                logger.warning("Circuit for %s opened after %d failure(s)", self.url, self.failures)
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class RetryBudget:
+    """Token bucket: each call deposits `ratio` tokens, each retry or hedge spends one."""
+
+    def __init__(self, ratio=BACKEND_RETRY_BUDGET, burst=BACKEND_RETRY_BUDGET_BURST):
+        self.ratio = ratio
+        self.burst = burst
+        self.lock = threading.Lock()
+        self.tokens = burst
+
+    def deposit(self):
+        with self.lock:
+            self.tokens = min(self.burst, self.tokens + self.ratio)
+
+    def withdraw(self):
+        with self.lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class LatencyWindow:
+    """Recent successful latencies of an endpoint, for the hedge delay."""
+
+    def __init__(
+        self,
+        percentile=BACKEND_HEDGE_PERCENTILE,
+        min_delay=BACKEND_HEDGE_MIN_DELAY,
+        default_delay=BACKEND_HEDGE_DEFAULT_DELAY,
+    ):
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.default_delay = default_delay
+        self.lock = threading.Lock()
+        self.samples = collections.deque(maxlen=LATENCY_WINDOW)
+
+    def add(self, seconds):
+        with self.lock:
+            self.samples.append(seconds)
+
+    def hedge_delay(self):
+        with self.lock:
+            if len(self.samples) < LATENCY_MIN_SAMPLES:
+                return self.default_delay
+            ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, round(self.percentile / 100 * (len(ordered) - 1)))
+        return max(self.min_delay, ordered[index])
+
+
+_hedge_executor = None
+_hedge_executor_lock = threading.Lock()
+
+
+def get_hedge_executor():
+    # Created on the first hedged call, so unhedged deployments start no threads
+    global _hedge_executor
+    with _hedge_executor_lock:
+        if _hedge_executor is None:
+            _hedge_executor = ThreadPoolExecutor(max_workers=BACKEND_HEDGE_WORKERS, thread_name_prefix="backend-hedge")
+        return _hedge_executor
+
+
+class BackendGuard:
+    """Circuit breaker, retry budget and hedging for one endpoint.
+
+    `is_backend_failure(error)` decides which errors count toward the
+    breaker, and `is_retryable(error)` which ones are retried.
+    """
+
+    def __init__(self, url, is_backend_failure, is_retryable, retries=BACKEND_RETRIES, hedge=BACKEND_HEDGE):
+        self.url = url
+        self.is_backend_failure = is_backend_failure
+        self.is_retryable = is_retryable
+        self.retries = retries
+        self.hedge = hedge
+        self.breaker = CircuitBreaker(url)
+        self.budget = RetryBudget()
+        self.latencies = LatencyWindow()
+
+    def call(self, attempt, hedge=True, may_retry=None):
+        """Return `attempt()`'s result, retrying and hedging it as configured.
+
+        Pass hedge=False for attempts that must not run twice at once (streams),
+        and `may_retry()` to veto a retry, e.g. once a stream has shown text.
+        """
+        self.budget.deposit()
+        retries = 0
+        while True:
+            try:
+                if hedge and self.hedge:
+                    return self._hedged(attempt)
+                return self._attempt(attempt)
+            except Exception as e:
+                if (
+                    retries >= self.retries
+                    # Nothing was sent, but only worth waiting for if the circuit is about to close
+                    or (isinstance(e, CircuitOpen) and e.retry_in > BACKEND_RETRY_BACKOFF_MAX)
+                    or not (isinstance(e, CircuitOpen) or self.is_retryable(e))
+                    or (may_retry is not None and not may_retry())
+                    or not self.budget.withdraw()
+                ):
+                    raise
+                retries += 1
+                delay = random.uniform(0, min(BACKEND_RETRY_BACKOFF_MAX, BACKEND_RETRY_BACKOFF * 2 ** (retries - 1)))
+                if isinstance(e, CircuitOpen):
+                    delay = max(delay, e.retry_in)
+                logger.info("Retrying request to %s in %.2fs after: %s", self.url, delay, e)
+                BACKEND_RETRIES_TOTAL.inc()
+                time.sleep(delay)
+
+    def _attempt(self, attempt):
+        self.breaker.before_call()
+        start = time.monotonic()
+        try:
+            result = attempt()
+        except Exception as e:
+            if self.is_backend_failure(e):
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()  # the backend answered
+            raise
+        self.breaker.record_success()
+        self.latencies.add(time.monotonic() - start)
+        return result
+
+    def _hedged(self, attempt):
+        executor = get_hedge_executor()
+        first = executor.submit(self._attempt, attempt)
+        try:
+            return first.result(timeout=self.latencies.hedge_delay())
+        except FutureTimeoutError:
+            pass
+        if not self.budget.withdraw():
+            return first.result()
+        BACKEND_HEDGES_TOTAL.inc()
+        second = executor.submit(self._attempt, attempt)
+        # The first success wins; the slower attempt finishes in the background
+        # and its result is ignored
+        running = {first, second}
+        while True:
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            succeeded = [future for future in done if future.exception() is None]
+            if succeeded:
+                if second in succeeded and first not in succeeded:
+                    BACKEND_HEDGE_WINS_TOTAL.inc()
+                return succeeded[0].result()
+            if not running:
+                return first.result()  # both failed: raise the first attempt's error
+
+
+_guards = {}
+_guards_lock = threading.Lock()
+
+
+def get_backend_guard(url, is_backend_failure, is_retryable):
+    """The process-wide BackendGuard of `url`, created on first use."""
+    with _guards_lock:
+        guard = _guards.get(url)
+        if guard is None:
+            guard = _guards[url] = BackendGuard(url, is_backend_failure, is_retryable)
+        return guard
@@ -0,0 +1,109 @@
+"""Process-wide cache of backend replies to answer-option clicks.
+
+Option buttons resend fixed strings, so in scripted story branches many users
+send the same message from the same conversation state. Replies are cached on
+(storyId, hash of the conversation so far, message) and served without a
+backend round trip until they expire or are evicted.
+"""
+import collections
+import os
+import threading
+import time
+
+from common.conversation_store import EMPTY_STATE_HASH, Conversation, chain_hash
+
+# Opt-in: replies can depend on more than the conversation text for some backends
+RESPONSE_CACHE = os.getenv("RESPONSE_CACHE", "false").lower() in ("1", "true", "yes")
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "300"))
+# Comma-separated storyIds whose replies must never be cached
+RESPONSE_CACHE_DISABLED_STORIES = [
+    s.strip() for s in os.getenv("RESPONSE_CACHE_DISABLED_STORIES", "").split(",") if s.strip()
+]
+
+
+def conversation_hash(messages):
+    """Stable hash of a chat history (a Conversation or a list of ChatMessages)."""
+    if isinstance(messages, Conversation):
+        return messages.state_hash
+    state = EMPTY_STATE_HASH
+    for message in messages:
+        state = chain_hash(state, message)
+    return state
+
+
+class ResponseCache:
+    """Thread-safe LRU cache whose entries also expire `ttl` seconds after being stored.
+
+    Cached replies are shared between sessions and must be treated as read-only.
+    """
+
+    def __init__(
+        self,
+        maxsize=RESPONSE_CACHE_SIZE,
+        ttl=RESPONSE_CACHE_TTL,
+        enabled=RESPONSE_CACHE,
+        disabled_stories=RESPONSE_CACHE_DISABLED_STORIES,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.enabled = enabled
+        self.disabled_stories = set(disabled_stories)
+        self.lock = threading.Lock()
+        self.entries = collections.OrderedDict()  # key -> (expires_at, reply)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key_for(self, story_id, messages, message):
+        """Cache key for sending `message` after `messages`, or None if caching is off for this story."""
+        if not self.enabled or story_id in self.disabled_stories:
+            return None
+        return (story_id, conversation_hash(messages), message)
+
+    def disable_story(self, story_id):
+        with self.lock:
+            self.disabled_stories.add(story_id)
+            for key in [k for k in self.entries if k[0] == story_id]:
+                del self.entries[key]
+
+    def enable_story(self, story_id):
+        with self.lock:
+            self.disabled_stories.discard(story_id)
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def contains(self, key):
+        """Like get() but without touching the LRU order or the counters."""
+        with self.lock:
+            entry = self.entries.get(key)
+            return entry is not None and entry[0] > time.monotonic()
+
+    def put(self, key, reply):
+        with self.lock:
+            if key[0] in self.disabled_stories:
+                return
+            self.entries[key] = (time.monotonic() + self.ttl, reply)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self.lock:
+            return {
+                "size": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,188 @@
+"""Process-wide registry of sessions, and reclamation of idle and closed ones.
+
+Every full script run records the session's per-story state (its
+conversations, pending turns and prefetched replies) here. A sweeper thread
+then checks all sessions every SESSION_SWEEP_INTERVAL seconds:
+
+* Pending turns are polled, so a turn whose deadline passed fails and frees
+  its dispatcher slot even when no tab is polling it any more.
+* A session with an open tab but no rerun for SESSION_IDLE_TTL seconds is
+  idle: its prefetched replies are dropped, and conversations kept in a disk
+  store (see CONVERSATION_STORE) spill their in-memory tail. The session
+  reads from the store if it comes back.
+* A session whose tab has been gone for SESSION_CLOSED_TTL seconds is
+  closed: its pending turns are cancelled (which also drops their Socket.IO
+  routes), its on-disk history is deleted and the registry lets go of it.
+
+It also publishes the number of sessions, threads and sockets of the process
+as gauges (see common.metrics).
+"""
+import os
+import threading
+import time
+
+from common.logs import get_logger
+from common.metrics import (
+    CLOSED_SESSIONS, IDLE_SESSIONS, PROCESS_SOCKETS, PROCESS_THREADS, SESSIONS, SESSIONS_RECLAIMED_TOTAL,
+)
+from common.prefetch import OptionPrefetcher
+
+# Seconds without a rerun after which an open session's memory is reclaimed; 0 disables it
+SESSION_IDLE_TTL = float(os.getenv("SESSION_IDLE_TTL", "900"))
+# Seconds after its tab is gone that a session is released; longer than
+# Streamlit's server.disconnectedSessionTTL (120 s), so a reconnecting tab
+# finds its state intact
+SESSION_CLOSED_TTL = float(os.getenv("SESSION_CLOSED_TTL", "300"))
+# Seconds between two sweeps
+SESSION_SWEEP_INTERVAL = float(os.getenv("SESSION_SWEEP_INTERVAL", "30"))
+
+logger = get_logger(__name__)
+
+
+def is_session_open(session_id):
+    """False once the session's browser tab has disconnected (or was never known)."""
+    from streamlit.runtime import Runtime
+
+    if not Runtime.exists():
+        return True  # e.g. under AppTest, where there is no server to ask
+    return Runtime.instance().is_active_session(session_id)
+
+
+def wake_session(session_id):
+    """Request a full rerun of one session from any thread; False if that is not possible.
+
+    Relies on Streamlit runtime internals, hence the defensive checks. Callers
+    keep a timed poll as the fallback.
+    """
+    from streamlit.runtime import Runtime
+
+    if not Runtime.exists():
+        return False
+    try:
+        session_info = Runtime.instance()._session_mgr.get_active_session_info(session_id)
+        if session_info is None:
+            return False
+        session = session_info.session
+        session._event_loop.call_soon_threadsafe(session.request_rerun, None)
+    except (AttributeError, RuntimeError):
+        return False
+    return True
+
+
+def count_sockets():
+    """Open socket file descriptors of this process, or None where /proc is unavailable."""
+    try:
+        fds = os.listdir("/proc/self/fd")
+    except OSError:
+        return None
+    sockets = 0
+    for fd in fds:
+        try:
+            if os.readlink(f"/proc/self/fd/{fd}").startswith("socket:"):
+                sockets += 1
+        except OSError:
+            pass  # closed while listing
+    return sockets
+
+
+class SessionRecord:
+    __slots__ = ("session_id", "stories", "last_seen", "closed_since", "idle")
+
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.stories = []  # one dict of STORY_STATE_KEYS values per story
+        self.last_seen = time.monotonic()
+        self.closed_since = None
+        self.idle = False
+
+    def turns(self):
+        return [story["pending_turn"] for story in self.stories if story.get("pending_turn") is not None]
+
+    def drop_prefetched(self):
+        for story in self.stories:
+            OptionPrefetcher.discard(story.get("prefetched_replies") or {})
+
+
+class SessionRegistry:
+    """Sessions of this process by session_id; thread-safe, sweeps in a daemon thread."""
+
+    def __init__(self, idle_ttl=SESSION_IDLE_TTL, closed_ttl=SESSION_CLOSED_TTL, interval=SESSION_SWEEP_INTERVAL):
+        self.idle_ttl = idle_ttl
+        self.closed_ttl = closed_ttl
+        self.lock = threading.Lock()
+        self.sessions = {}
+        self.thread = threading.Thread(target=self._run, args=(interval,), name="session-sweeper", daemon=True)
+        self.thread.start()
+
+    def touch(self, session_id, stories):
+        """Record a script run of `session_id`; `stories` as returned by stories.story_states()."""
+        with self.lock:
+            record = self.sessions.get(session_id)
+            if record is None:
+                record = self.sessions[session_id] = SessionRecord(session_id)
+            record.stories = stories
+            record.last_seen = time.monotonic()
+            record.closed_since = None
+            record.idle = False
+
+    def _run(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.sweep()
+            except Exception:
+                logger.exception("Session sweep failed")
+
+    def sweep(self):
+        now = time.monotonic()
+        with self.lock:
+            records = list(self.sessions.values())
+        released = []
+        for record in records:
+            for turn in record.turns():
+                turn.done()  # fails a tracked turn whose deadline has passed
+            if not is_session_open(record.session_id):
+                if record.closed_since is None:
+                    record.closed_since = now
+                elif now - record.closed_since >= self.closed_ttl:
+                    released.append(record)
+            elif not record.idle and self.idle_ttl > 0 and now - record.last_seen >= self.idle_ttl:
+                self._reclaim_idle(record)
+        for record in released:
+            with self.lock:
+                if record.closed_since is None or self.sessions.get(record.session_id) is not record:
+                    continue  # came back in the meantime
+                del self.sessions[record.session_id]
+            self._release(record)
+        self._publish()
+
+    def _reclaim_idle(self, record):
+        record.idle = True
+        record.drop_prefetched()
+        for story in record.stories:
+            if story.get("messages") is not None:
+                story["messages"].spill()
+        logger.info("Session %s idle for %.0fs, reclaimed its cached state", record.session_id, self.idle_ttl)
+
+    def _release(self, record):
+        for turn in record.turns():
+            if not turn.done():
+                turn.cancel()
+        record.drop_prefetched()
+        for story in record.stories:
+            if story.get("messages") is not None:
+                story["messages"].close()
+        record.stories = []
+        SESSIONS_RECLAIMED_TOTAL.inc()
+        logger.info("Session %s closed, released its resources", record.session_id)
+
+    def _publish(self):
+        with self.lock:
+            records = list(self.sessions.values())
+        SESSIONS.set(len(records))
+        IDLE_SESSIONS.set(sum(1 for r in records if r.idle and r.closed_since is None))
+        CLOSED_SESSIONS.set(sum(1 for r in records if r.closed_since is not None))
+        PROCESS_THREADS.set(threading.active_count())
+        sockets = count_sockets()
+        if sockets is not None:
+            PROCESS_SOCKETS.set(sockets)
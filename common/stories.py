@@ -0,0 +1,48 @@
+"""Several stories (conversations) per browser session.
+
+CHAT_STORIES lists the storyIds a session can switch between. Only the
+active story's state lives under the usual session-state keys; the others
+are parked, untouched, in st.session_state.stories. Switching swaps them in
+and out without reloading or refetching anything. A story's conversation is
+only created the first time it is opened, and a parked story's pending turn
+keeps running and is picked up when the story is opened again.
+"""
+import os
+
+import streamlit as st
+
+# storyIds offered in the story switcher; the first one is opened on start
+CHAT_STORIES = [s.strip() for s in os.getenv("CHAT_STORIES", "STRY1").split(",") if s.strip()] or ["STRY1"]
+
+# Session-state keys that belong to the active story
+STORY_STATE_KEYS = ("messages", "current_answer_options", "prefetched_replies", "pending_turn", "history_shown")
+
+
+def switch_story(story_id):
+    """Park the active story's state and bring back (or start) `story_id`'s."""
+    state = st.session_state
+    if story_id == state.story_id:
+        return
+    state.stories[state.story_id] = {key: state[key] for key in STORY_STATE_KEYS if key in state}
+    for key in STORY_STATE_KEYS:
+        if key in state:
+            del state[key]
+    for key, value in state.stories.pop(story_id, {}).items():
+        state[key] = value
+    state.story_id = story_id
+
+
+def story_label(story_id):
+    """`story_id`, marked while a parked story has a reply in flight or waiting to be shown."""
+    parked = st.session_state.stories.get(story_id, {})
+    turn = parked.get("pending_turn")
+    if turn is None:
+        return story_id
+    return f"{story_id} (new reply)" if turn.done() else f"{story_id} (waiting…)"
+
+
+def story_states():
+    """The active story's state and every parked story's, as dicts of STORY_STATE_KEYS values."""
+    state = st.session_state
+    active = {key: state[key] for key in STORY_STATE_KEYS if key in state}
+    return [active, *state.stories.values()]
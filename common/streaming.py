@@ -0,0 +1,74 @@
+"""Settings, parsing and buffering for streamed AI replies."""
+import os
+import threading
+
+from common.metrics import STREAM_COALESCED_TOTAL, STREAM_QUEUE_DEPTH
+
+# Opt-in: ask the backend for a streamed reply instead of a single response
+STREAM_RESPONSES = os.getenv("STREAM_RESPONSES", "false").lower() in ("1", "true", "yes")
+# Minimum seconds between two redraws of a reply that is still streaming
+STREAM_FLUSH_INTERVAL = float(os.getenv("STREAM_FLUSH_INTERVAL", "0.1"))
+# Chunks buffered per reply between two redraws before they are merged into one
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "64"))
+# Seconds between two checks of a pending reply that is not streamed. A
+# finished turn wakes its session at once; this only catches a missed wake-up
+PENDING_POLL_INTERVAL = float(os.getenv("PENDING_POLL_INTERVAL", "0.5"))
+
+
+class ChunkChannel:
+    """Hands streamed text from a producer thread to the script thread.
+
+    The producer (a dispatch worker or a Socket.IO thread shared by every
+    session) never blocks: once `size` chunks are waiting, they are merged
+    into one, so the buffer holds at most `size` segments however bursty the
+    backend is. The script thread drains everything that arrived since its
+    last redraw in one batch.
+    """
+
+    def __init__(self, size=STREAM_QUEUE_SIZE):
+        self.size = max(1, size)
+        self.lock = threading.Lock()
+        self.name = "assistant"
+        self.segments = []
+        self.drained = ""
+
+    def put(self, name, delta):
+        with self.lock:
+            # Only the latest speaker name is shown, so name changes merge too
+            self.name = name
+            if len(self.segments) >= self.size:
+                self.segments = ["".join(self.segments)]
+                STREAM_COALESCED_TOTAL.inc()
+            self.segments.append(delta)
+
+    def drain(self):
+        """Return (name, all text so far), taking in what arrived since the last call."""
+        with self.lock:
+            segments, self.segments = self.segments, []
+            name = self.name
+        if segments:
+            STREAM_QUEUE_DEPTH.observe(len(segments))
+            self.drained += "".join(segments)
+        return name, self.drained
+
+
+def iter_sse_events(lines):
+    """Parse server-sent events from an iterable of lines into (event, data) pairs."""
+    event, data = "message", []
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        if not line:
+            if data:
+                yield event, "\n".join(data)
+            event, data = "message", []
+        elif not line.startswith(":"):
+            field, _, value = line.partition(":")
+            if value.startswith(" "):
+                value = value[1:]
+            if field == "event":
+                event = value
+            elif field == "data":
+                data.append(value)
+    if data:
+        yield event, "\n".join(data)
@@ -0,0 +1,37 @@
+"""Backend transports for app.py, one module per protocol.
+
+Only the selected transport's module, and so only its client library, is
+imported: a REST deployment never loads gql or python-socketio.
+"""
+import importlib
+import os
+
+# name -> (module, port variable that configures it)
+TRANSPORTS = {
+    "rest": ("common.transports.rest_transport", "API_REST_PORT"),
+    "graphql": ("common.transports.graphql_transport", "API_GRAPHQL_PORT"),
+    "socketio": ("common.transports.socketio_transport", "API_WS_PORT"),
+}
+
+
+def resolve_transport_name(name=None):
+    """Map CHAT_TRANSPORT to a key of TRANSPORTS.
+
+    "auto" (the default) picks the first protocol, in the order above, whose
+    port is configured.
+    """
+    name = (name or os.getenv("CHAT_TRANSPORT", "auto")).lower()
+    if name == "auto":
+        for candidate, (_, port_variable) in TRANSPORTS.items():
+            if os.getenv(port_variable):
+                return candidate
+        raise RuntimeError("CHAT_TRANSPORT=auto needs one of API_REST_PORT, API_GRAPHQL_PORT or API_WS_PORT")
+    if name not in TRANSPORTS:
+        raise ValueError(f"Unknown CHAT_TRANSPORT {name!r}; expected auto, {', '.join(TRANSPORTS)}")
+    return name
+
+
+def create_transport(name=None):
+    """Import the selected transport's module and return a new ChatTransport."""
+    module = importlib.import_module(TRANSPORTS[resolve_transport_name(name)][0])
+    return module.create_transport()
@@ -0,0 +1,64 @@
+"""The interface app.py talks to, whatever the protocol."""
+from common.streaming import STREAM_RESPONSES
+
+
+class ChatTransport:
+    """Sends chat messages to the backend and returns its replies.
+
+    Replies are returned as the plain reply body, {"answers", "answerOptions"}
+    (see common.replies), whatever the protocol wraps them in, or as a Reply
+    when the transport decodes the raw body itself. Everything
+    except connect() may be called off the script thread and must not touch
+    st.session_state.
+    """
+
+    # Shown in the page title and status messages
+    title = ""
+    server = "backend"
+    url = ""
+    # Whether messages can be sent while disconnected, to go out on reconnect
+    queues_offline = False
+
+    def connect(self):
+        """Bring up a persistent connection if the protocol has one.
+
+        Called on every rerun; returns whether it is connected, or None for
+        connectionless protocols, whose status is only known after a request.
+        """
+        return None
+
+    def is_connecting(self):
+        return False
+
+    def fetch_reply(self, message, story_id="STRY1"):
+        """Send `message` and return its reply; raises on failure."""
+        raise NotImplementedError
+
+    def fetch_streamed_reply(self, message, on_chunk, story_id="STRY1"):
+        """Like fetch_reply, calling `on_chunk(name, delta)` as the reply streams in.
+
+        Returns None if the stream ends without the final reply.
+        """
+        raise NotImplementedError
+
+    def start_turn(self, dispatcher, message, cache_key=None, story_id="STRY1", order_key=None):
+        """Start fetching the reply to `message` and return its Turn without blocking.
+
+        Runs the blocking fetch on a dispatcher worker, after any earlier turn
+        with the same `order_key`; push-based transports override this to
+        resolve a tracked Turn from their own threads.
+        """
+        def run(message, on_chunk):
+            if STREAM_RESPONSES:
+                return self.fetch_streamed_reply(message, on_chunk, story_id)
+            return self.fetch_reply(message, story_id)
+
+        return dispatcher.submit(run, message, cache_key, key=order_key)
+
+    def is_connection_error(self, error):
+        """Whether a failed request means the backend is unreachable, not just slow or erroring."""
+        return True
+
+    def error_message(self, error):
+        """Text shown to the user when a request failed with `error`."""
+        return f"An error occurred during the request to {self.url}: {error}"
@@ -0,0 +1,434 @@
+"""GraphQL transport: the createChat mutation, or the chatStream subscription."""
+import asyncio
+import concurrent.futures
+import hashlib
+import os
+import queue
+import threading
+import time
+
+import httpx
+from gql import Client, GraphQLRequest, gql
+from gql.transport.exceptions import TransportClosed, TransportConnectionFailed, TransportQueryError, TransportServerError
+from gql.transport.httpx import HTTPXAsyncTransport
+from graphql import build_schema, print_ast, validate
+
+from common.event_loop import BackgroundLoop
+from common.graphql_schema import load_client_schema
+from common.logs import get_logger
+from common.metrics import BACKEND_RTT_SECONDS
+from common.resilience import BACKEND_RETRY_TIMEOUTS, RETRYABLE_STATUS_CODES, CircuitOpen, get_backend_guard
+from common.transports.base import ChatTransport
+
+# Assuming your NestJS backend has a GraphQL endpoint like /graphql
+GRAPHQL_URL = os.getenv("API_HOST", "") + ":" + os.getenv("API_GRAPHQL_PORT", "") + "/graphql"
+# Subscriptions (streamed replies) go over a websocket on the same endpoint
+GRAPHQL_WS_URL = GRAPHQL_URL.replace("http", "ws", 1)
+# Seconds to wait for a mutation result, or between two subscription events
+GRAPHQL_TIMEOUT = float(os.getenv("GRAPHQL_TIMEOUT", "10"))
+# Seconds createChat mutations are collected for one array-batched request;
+# 0 (the default) sends each on its own. The server must accept batched
+# requests (e.g. Apollo's allowBatchedHttpRequests).
+GRAPHQL_BATCH_WINDOW = float(os.getenv("GRAPHQL_BATCH_WINDOW", "0"))
+# Most mutations in one batched request
+GRAPHQL_BATCH_MAX = int(os.getenv("GRAPHQL_BATCH_MAX", "10"))
+# Send the createChat mutation as an Automatic Persisted Query: its SHA-256
+# hash instead of its text, which is only sent again when the server asks for
+# it. The server must support APQ (Apollo Server does by default).
+GRAPHQL_PERSISTED_QUERIES = os.getenv("GRAPHQL_PERSISTED_QUERIES", "false").lower() in ("1", "true", "yes")
+
+logger = get_logger(__name__)
+
+# --- GraphQL Mutation Definition ---
+# This is a conceptual mutation. Your actual backend GraphQL schema
+# must define a mutation like `createChat` that takes `storyId` and `message`
+# and returns `answers` and `answerOptions` with their respective types.
+CHAT_MUTATION = gql(
+    """
+    mutation CreateChatMessage($storyId: String!, $message: String!) {
+        createChat(input: { storyId: $storyId, message: $message }) {
+            answers {
+                name
+                message
+            }
+            answerOptions {
+                isNeeded
+                options
+            }
+        }
+    }
+    """
+)
+
+# --- GraphQL Subscription Definition ---
+# Streaming counterpart of CHAT_MUTATION, used when STREAM_RESPONSES is on.
+# Each event carries a text `delta`; the last one has `done: true` and the
+# full `answers` / `answerOptions`, shaped like the mutation result.
+CHAT_SUBSCRIPTION = gql(
+    """
+    subscription ChatStream($storyId: String!, $message: String!) {
+        chatStream(input: { storyId: $storyId, message: $message }) {
+            name
+            delta
+            done
+            answers {
+                name
+                message
+            }
+            answerOptions {
+                isNeeded
+                options
+            }
+        }
+    }
+    """
+)
+
+
+# --- Automatic Persisted Queries ---
+# Printed text and hash of each document, computed once (documents are module constants)
+_persisted_queries = {}
+
+
+def persisted_query(document):
+    """(query text, sha256 hex digest) of `document`."""
+    entry = _persisted_queries.get(id(document))
+    if entry is None:
+        query = print_ast(document)
+        entry = _persisted_queries[id(document)] = (document, query, hashlib.sha256(query.encode("utf-8")).hexdigest())
+    return entry[1], entry[2]
+
+
+class PersistedQueryRequest(GraphQLRequest):
+    """A request whose payload carries the query's hash, and its text only with include_query."""
+
+    def __init__(self, request, *, include_query=False, **kwargs):
+        super().__init__(request, **kwargs)
+        self.include_query = include_query
+
+    @property
+    def payload(self):
+        query, sha256_hash = persisted_query(self.document)
+        payload = {"query": query} if self.include_query else {}
+        if self.operation_name:
+            payload["operationName"] = self.operation_name
+        if self.variable_values:
+            payload["variables"] = self.variable_values
+        payload["extensions"] = {**(self.extensions or {}), "persistedQuery": {"version": 1, "sha256Hash": sha256_hash}}
+        return payload
+
+
+def persisted_query_error(error):
+    """The persisted-query error code in a TransportQueryError's errors, or None."""
+    for item in error.errors or []:
+        if not isinstance(item, dict):
+            continue
+        code = (item.get("extensions") or {}).get("code")
+        if code in ("PERSISTED_QUERY_NOT_FOUND", "PERSISTED_QUERY_NOT_SUPPORTED"):
+            return code
+        if item.get("message") == "PersistedQueryNotFound":
+            return "PERSISTED_QUERY_NOT_FOUND"
+        if item.get("message") == "PersistedQueryNotSupported":
+            return "PERSISTED_QUERY_NOT_SUPPORTED"
+    return None
+
+
+# --- Persistent GraphQL Session ---
+# A gql session that is connected once and then reused by every call, instead
+# of connecting (and building an event loop) per message. All of its coroutines
+# must run on the same event loop.
+class PersistentGraphQLSession:
+    def __init__(self, client):
+        self.client = client
+        self.session = None
+        self.lock = None  # created on the event loop on first use
+
+    async def get_session(self):
+        if self.lock is None:
+            self.lock = asyncio.Lock()
+        async with self.lock:
+            if self.session is None:
+                self.session = await self.client.connect_async()
+        return self.session
+
+    async def reset(self):
+        # Drop a broken connection; the next call connects again
+        if self.session is not None:
+            self.session = None
+            try:
+                await self.client.close_async()
+            except Exception:
+                pass
+
+    async def execute(self, request):
+        session = await self.get_session()
+        try:
+            return await session.execute(request)
+        except TransportClosed:
+            await self.reset()
+            raise
+
+    async def validation_error(self, request):
+        """The request's first error against the client's schema; None if valid or there is no schema."""
+        await self.get_session()  # fetches the schema if the client was built without one
+        errors = validate(self.client.schema, request.document) if self.client.schema is not None else []
+        return errors[0] if errors else None
+
+    async def execute_batch(self, requests):
+        # One ExecutionResult per request, errors included. Sent through the
+        # transport's public execute_batch (gql >= 4): the session's raises on
+        # the first error and loses the other results. What the session would
+        # add is done elsewhere or not needed: callers validate first (see
+        # validation_error), and this client neither serializes variables nor
+        # parses results.
+        session = await self.get_session()
+        try:
+            return await session.transport.execute_batch(requests)
+        except TransportClosed:
+            await self.reset()
+            raise
+
+    async def subscribe(self, request, on_result):
+        session = await self.get_session()
+        try:
+            async for result in session.subscribe(request):
+                on_result(result)
+        except TransportClosed:
+            await self.reset()
+            raise
+
+
+# --- Mutation Batching ---
+# Mutations arriving within `window` seconds of the first one, from any
+# session, go out as one array-batched HTTP request, and each caller gets its
+# own result back. Batches are sent as soon as they close, without waiting for
+# the previous one to return. Runs entirely on the session's event loop.
+class GraphQLBatcher:
+    def __init__(self, session, window=GRAPHQL_BATCH_WINDOW, max_size=GRAPHQL_BATCH_MAX):
+        self.session = session
+        self.window = window
+        self.max_size = max_size
+        self.queued = []  # (request, asyncio.Future) of the batch being collected
+        self.flush_handle = None
+
+    async def execute(self, request):
+        future = asyncio.get_running_loop().create_future()
+        self.queued.append((request, future))
+        if len(self.queued) >= self.max_size:
+            self._flush()
+        elif self.flush_handle is None:
+            self.flush_handle = asyncio.get_running_loop().call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        batch, self.queued = [(r, f) for r, f in self.queued if not f.done()], []
+        if batch:
+            asyncio.ensure_future(self._send(batch))
+
+    async def _execute_all(self, requests):
+        if len(requests) == 1:
+            return [await self.session.execute(requests[0])]
+        # Each caller gets its own operation's result or error. An operation
+        # that fails validation is not sent. The batch is never sent again:
+        # createChat is not idempotent, and the operations that succeeded have
+        # already run on the server.
+        outcomes = [await self.session.validation_error(request) for request in requests]
+        valid = [request for request, error in zip(requests, outcomes) if error is None]
+        results = iter(await self.session.execute_batch(valid) if valid else [])
+        for i, error in enumerate(outcomes):
+            if error is not None:
+                continue
+            result = next(results)
+            if result.errors:
+                outcomes[i] = TransportQueryError(
+                    str(result.errors[0]), errors=result.errors, data=result.data, extensions=result.extensions,
+                )
+            else:
+                outcomes[i] = result.data
+        return outcomes
+
+    async def _send(self, batch):
+        try:
+            outcomes = await self._execute_all([request for request, _ in batch])
+        except Exception as e:
+            outcomes = [e] * len(batch)
+        for (_, future), outcome in zip(batch, outcomes):
+            if future.done():
+                continue  # timed out or cancelled by its caller
+            if isinstance(outcome, BaseException):
+                future.set_exception(outcome)
+            else:
+                future.set_result(outcome)
+
+
+class GraphQLTransport(ChatTransport):
+    title = "GraphQL"
+    server = "NestJS GraphQL server"
+
+    def __init__(
+        self,
+        url=GRAPHQL_URL,
+        ws_url=GRAPHQL_WS_URL,
+        timeout=GRAPHQL_TIMEOUT,
+        batch_window=GRAPHQL_BATCH_WINDOW,
+        persisted_queries=GRAPHQL_PERSISTED_QUERIES,
+    ):
+        self.url = url
+        self.ws_url = ws_url
+        self.timeout = timeout
+        self.batch_window = batch_window
+        # Turned off for good if the server says it does not support APQ
+        self.persisted_queries = persisted_queries
+        self.batcher = None
+        # One event loop thread per process owns both sessions; callers submit
+        # coroutines to it and wait on the returned futures
+        self.loop = BackgroundLoop(name="graphql-loop")
+        self.session = None
+        self.session_lock = threading.Lock()
+        self.ws_session = None
+        self.ws_session_lock = threading.Lock()
+        # Breaker, retries and hedging, shared with every other user of this URL
+        self.guard = get_backend_guard(self.url, self.is_backend_failure, self.is_retryable)
+
+    def _create_client(self):
+        transport = HTTPXAsyncTransport(url=self.url)
+        # Built from the on-disk schema cache so a fresh process does not have to
+        # introspect before its first message (see GRAPHQL_SCHEMA_MODE)
+        schema, refresh = load_client_schema(self.url)
+        client = Client(transport=transport, schema=schema, fetch_schema_from_transport=schema is None)
+        if refresh is not None:
+            refresh(lambda sdl: setattr(client, "schema", build_schema(sdl)))
+        return client
+
+    def _get_session(self):
+        # Built on the first request (on a worker), so a backend that is down
+        # while the schema is loaded surfaces as a failed turn, not a crashed page
+        with self.session_lock:
+            if self.session is None:
+                self.session = PersistentGraphQLSession(self._create_client())
+                if self.batch_window > 0:
+                    self.batcher = GraphQLBatcher(self.session, self.batch_window)
+            return self.session
+
+    def _get_ws_session(self):
+        # Subscriptions share one websocket connection, opened on first use so
+        # unstreamed deployments never import the websockets client
+        with self.ws_session_lock:
+            if self.ws_session is None:
+                from gql.transport.websockets import WebsocketsTransport
+
+                self.ws_session = PersistentGraphQLSession(Client(transport=WebsocketsTransport(url=self.ws_url)))
+            return self.ws_session
+
+    def fetch_reply(self, message, story_id="STRY1"):
+        variables = {"storyId": story_id, "message": message}
+        # Execute the mutation on the shared session
+        if self.persisted_queries:
+            request = PersistedQueryRequest(CHAT_MUTATION, variable_values=variables)
+        else:
+            request = GraphQLRequest(CHAT_MUTATION, variable_values=variables)
+        with BACKEND_RTT_SECONDS.time():
+            # The session is looked up on this thread: building it may load the schema
+            result = self.guard.call(
+                lambda: self.loop.run(self._execute(self._get_session(), request), timeout=self.timeout)
+            )
+        return result['createChat']
+
+    async def _execute(self, session, request):
+        try:
+            return await self._send(session, request)
+        except TransportQueryError as e:
+            if not isinstance(request, PersistedQueryRequest) or request.include_query:
+                raise
+            code = persisted_query_error(e)
+            if code is None:
+                raise
+            if code == "PERSISTED_QUERY_NOT_SUPPORTED":
+                if self.persisted_queries:
+                    logger.warning("%s does not support persisted queries; sending full queries from now on", self.url)
+                    self.persisted_queries = False
+                # Without the persistedQuery extension, which such a server rejects
+                return await self._send(session, GraphQLRequest(request))
+            # Unknown hash (first use, or the server forgot it): send the text
+            # along, and the server stores it under the hash
+            return await self._send(session, PersistedQueryRequest(request, include_query=True))
+
+    async def _send(self, session, request):
+        if self.batcher is not None:
+            return await self.batcher.execute(request)
+        return await session.execute(request)
+
+    def _subscribe(self, request, on_chunk):
+        # Results are handed over from the event loop thread
+        results = queue.Queue()
+        rtt_timer = BACKEND_RTT_SECONDS.time()
+        future = self.loop.submit(self._get_ws_session().subscribe(request, results.put))
+        try:
+            deadline = time.monotonic() + self.timeout
+            while True:
+                try:
+                    result = results.get(timeout=0.05)
+                except queue.Empty:
+                    if future.done() and results.empty():
+                        future.result()  # re-raise if the subscription failed
+                        return None
+                    if time.monotonic() > deadline:
+                        raise TimeoutError(f"no subscription event within {self.timeout}s")
+                    continue
+                deadline = time.monotonic() + self.timeout
+                chunk = result['chatStream']
+                if chunk.get('done'):
+                    rtt_timer.stop()
+                    return chunk
+                on_chunk(chunk.get('name', 'assistant'), chunk.get('delta', ''))
+        finally:
+            # Stops the subscription on a timeout or when the turn is cancelled
+            future.cancel()
+
+    def fetch_streamed_reply(self, message, on_chunk, story_id="STRY1"):
+        variables = {"storyId": story_id, "message": message}
+        request = GraphQLRequest(CHAT_SUBSCRIPTION, variable_values=variables)
+        streaming = [False]
+
+        def forward(name, delta):
+            streaming[0] = True
+            on_chunk(name, delta)
+
+        # Never hedged, and only retried while nothing has been shown
+        return self.guard.call(lambda: self._subscribe(request, forward), hedge=False, may_retry=lambda: not streaming[0])
+
+    def is_backend_failure(self, error):
+        # GraphQL errors in the result (TransportQueryError) mean the server answered
+        return isinstance(error, (
+            TransportConnectionFailed, TransportClosed, TransportServerError, httpx.TransportError,
+            TimeoutError, concurrent.futures.TimeoutError,
+        ))
+
+    def is_retryable(self, error):
+        if isinstance(error, TransportClosed):
+            return True  # raised before sending: the session was not connected
+        if isinstance(error, TransportServerError):
+            return error.code in RETRYABLE_STATUS_CODES
+        if isinstance(error, TransportConnectionFailed) and error.__cause__ is not None:
+            # The HTTP transport wraps the httpx error it failed with
+            error = error.__cause__
+        if isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout, ConnectionRefusedError)):
+            return True
+        if isinstance(error, (httpx.TimeoutException, TimeoutError, concurrent.futures.TimeoutError)):
+            return BACKEND_RETRY_TIMEOUTS
+        return False
+
+    def is_connection_error(self, error):
+        return isinstance(error, (TransportConnectionFailed, httpx.ConnectError, CircuitOpen))
+
+    def error_message(self, error):
+        if isinstance(error, CircuitOpen):
+            return str(error)
+        return f"GraphQL request failed: {error}"
+
+
+def create_transport():
+    return GraphQLTransport()
@@ -0,0 +1,139 @@
+"""REST transport: POST /api/chat, or server-sent events from /api/chat/stream."""
+import json
+import os
+
+import requests
+
+from common.event_loop import BackgroundLoop
+from common.http_client import (
+    REST_COMPRESSION, REST_TIMEOUT, BodyEncoder, create_async_http_client, create_http_session,
+)
+from common.metrics import BACKEND_RTT_SECONDS
+from common.replies import decode_reply
+from common.resilience import BACKEND_RETRY_TIMEOUTS, RETRYABLE_STATUS_CODES, CircuitOpen, get_backend_guard
+from common.streaming import iter_sse_events
+from common.transports.base import ChatTransport
+
+# Assuming your NestJS backend has an endpoint like /api/chat that accepts POST requests
+# and returns a JSON response similar to your WebSocket 'messageReply' structure.
+NESTJS_REST_API_URL = os.getenv("API_HOST", "") + ":" + os.getenv("API_REST_PORT", "") + "/api/chat"
+# Server-sent events variant of the same endpoint, used when STREAM_RESPONSES is on.
+# Emits "chunk" events ({"name", "delta"}) and a final "done" event with the full reply.
+NESTJS_REST_STREAM_URL = NESTJS_REST_API_URL + "/stream"
+# Send chat messages through the shared async client instead of the pooled requests.Session
+REST_ASYNC_CLIENT = os.getenv("REST_ASYNC_CLIENT", "false").lower() in ("1", "true", "yes")
+
+
+class RestTransport(ChatTransport):
+    title = "REST API"
+    server = "NestJS REST API server"
+
+    def __init__(
+        self,
+        url=NESTJS_REST_API_URL,
+        stream_url=NESTJS_REST_STREAM_URL,
+        use_async_client=REST_ASYNC_CLIENT,
+        compression=REST_COMPRESSION,
+    ):
+        self.url = url
+        self.stream_url = stream_url
+        # JSON bodies, gzip/brotli-compressed with REST_COMPRESSION
+        self.encoder = BodyEncoder(compression)
+        # Pooled keep-alive connections, shared by all sessions and threads
+        self.session = create_http_session()
+        self.loop = None
+        self.async_client = None
+        # Errors that get their own message, see error_message()
+        self.connect_errors = (requests.exceptions.ConnectionError,)
+        self.timeout_errors = (requests.exceptions.Timeout, TimeoutError)
+        if use_async_client:
+            import httpx
+
+            # Shared by all sessions through one event loop and connection pool;
+            # the client is only ever used from the loop's thread
+            self.loop = BackgroundLoop(name="rest-async-loop")
+            self.async_client = create_async_http_client()
+            self.connect_errors += (httpx.ConnectError, httpx.ConnectTimeout)
+            self.timeout_errors += (httpx.TimeoutException,)
+        # Breaker, retries and hedging, shared with every other user of this URL
+        self.guard = get_backend_guard(self.url, self.is_backend_failure, self.is_retryable)
+
+    async def _post_async(self, body, headers):
+        response = await self.async_client.post(self.url, content=body, headers=headers)
+        response.raise_for_status()
+        return response.content
+
+    def _post(self, payload):
+        # Both clients undo a compressed response's Content-Encoding
+        body, headers = self.encoder.encode(payload)
+        if self.async_client is not None:
+            return self.loop.run(self._post_async(body, headers))
+        response = self.session.post(self.url, data=body, headers=headers, timeout=REST_TIMEOUT)
+        response.raise_for_status()  # Raise an HTTPError for bad responses (4xx or 5xx)
+        return response.content
+
+    def fetch_reply(self, message, story_id="STRY1"):
+        payload = {"storyId": story_id, "message": message}
+        with BACKEND_RTT_SECONDS.time():
+            body = self.guard.call(lambda: self._post(payload))
+        # Decoded and validated in one pass (see REPLY_DECODER), here rather
+        # than on the shared event loop
+        return decode_reply(body)
+
+    def _post_streamed(self, payload, on_chunk):
+        body, headers = self.encoder.encode(payload)
+        headers = {**headers, "Accept": "text/event-stream"}
+        rtt_timer = BACKEND_RTT_SECONDS.time()
+        with self.session.post(self.stream_url, data=body, headers=headers, timeout=REST_TIMEOUT, stream=True) as response:
+            response.raise_for_status()
+            for event, data in iter_sse_events(response.iter_lines()):
+                if event == "chunk":
+                    chunk = json.loads(data)
+                    on_chunk(chunk.get('name', 'assistant'), chunk.get('delta', ''))
+                elif event == "done":
+                    rtt_timer.stop()
+                    return decode_reply(data)
+        return None
+
+    def fetch_streamed_reply(self, message, on_chunk, story_id="STRY1"):
+        payload = {"storyId": story_id, "message": message}
+        streaming = [False]
+
+        def forward(name, delta):
+            streaming[0] = True
+            on_chunk(name, delta)
+
+        # Never hedged, and only retried while nothing has been shown
+        return self.guard.call(lambda: self._post_streamed(payload, forward), hedge=False, may_retry=lambda: not streaming[0])
+
+    def is_backend_failure(self, error):
+        if isinstance(error, self.connect_errors + self.timeout_errors):
+            return True
+        # requests.HTTPError and httpx.HTTPStatusError
+        response = getattr(error, "response", None)
+        return response is not None and response.status_code >= 500
+
+    def is_retryable(self, error):
+        # requests' ConnectTimeout is a ConnectionError too: the message was never sent
+        if isinstance(error, self.connect_errors):
+            return True
+        if isinstance(error, self.timeout_errors):
+            return BACKEND_RETRY_TIMEOUTS
+        response = getattr(error, "response", None)
+        return response is not None and response.status_code in RETRYABLE_STATUS_CODES
+
+    def is_connection_error(self, error):
+        return isinstance(error, self.connect_errors + (CircuitOpen,))
+
+    def error_message(self, error):
+        if isinstance(error, CircuitOpen):
+            return str(error)
+        if isinstance(error, self.connect_errors):
+            return f"Connection error: Could not connect to the backend. Please ensure the server is running at {self.url}. Error: {error}"
+        if isinstance(error, self.timeout_errors):
+            return f"Request timed out. The server took too long to respond from {self.url}."
+        return f"An error occurred during the API request: {error}"
+
+
+def create_transport():
+    return RestTransport()
@@ -0,0 +1,353 @@
+"""Socket.IO transport: createChat emits answered by messageReply events."""
+import collections
+import concurrent.futures
+import itertools
+import os
+import random
+import threading
+import time
+import uuid
+
+import socketio
+
+from common.dispatch import TurnCancelled
+from common.logs import get_logger
+from common.metrics import BACKEND_RTT_SECONDS
+from common.streaming import STREAM_RESPONSES
+from common.transports.base import ChatTransport
+
+NESTJS_WEBSOCKET_URL = os.getenv("API_HOST", "") + ":" + os.getenv("API_WS_PORT", "")
+# Number of Socket.IO connections shared by all sessions of this process
+WS_POOL_SIZE = int(os.getenv("WS_POOL_SIZE", "2"))
+# Seconds to wait for a messageReply before the turn fails
+WS_REPLY_TIMEOUT = float(os.getenv("WS_REPLY_TIMEOUT", "30"))
+# Backoff between reconnect rounds: uniform in [0, min(MAX, DELAY * 2**round)] seconds
+WS_RECONNECT_DELAY = float(os.getenv("WS_RECONNECT_DELAY", "0.5"))
+WS_RECONNECT_DELAY_MAX = float(os.getenv("WS_RECONNECT_DELAY_MAX", "30"))
+# createChat emits held while no connection is up; beyond that, sending fails
+WS_OUTBOX_SIZE = int(os.getenv("WS_OUTBOX_SIZE", "100"))
+# Packet encoding: json (the Socket.IO default) or msgpack, which sends binary
+# MessagePack frames (needs the msgpack package, and a server using the
+# msgpack parser, e.g. socket.io-msgpack-parser)
+WS_SERIALIZER = os.getenv("WS_SERIALIZER", "json").lower()
+
+logger = get_logger(__name__)
+
+
+class PendingReply:
+    """Where a reply goes once its messageReply arrives.
+
+    `index` is the connection it was emitted on, or None while it waits in
+    the outbox. Requests with the same `order_key` go out on one connection.
+    """
+
+    __slots__ = ("future", "on_chunk", "payload", "order_key", "index", "sent_at", "chunked")
+
+    def __init__(self, future, on_chunk, payload, order_key=None):
+        self.future = future
+        self.on_chunk = on_chunk
+        self.payload = payload
+        self.order_key = order_key
+        self.index = None
+        self.sent_at = time.perf_counter()
+        self.chunked = False  # some of its text has been shown
+
+
+# --- Shared Socket.IO Connection Pool ---
+# A handful of Socket.IO connections serve every session in the process.
+# Every createChat carries a correlationId that the backend echoes in
+# messageChunk / messageReply, which is how the reply finds its way back to
+# the future of the turn that sent it.
+#
+# While no connection is up, emits wait in a bounded outbox and are sent in
+# order once one is back. Requests whose connection dropped before their reply
+# arrived go back to the front of the outbox and are sent again with the same
+# correlationId and `resume: true`, so a backend that keeps replies by
+# correlationId can resend the reply instead of answering twice.
+#
+# The backend handles one connection's events in order, but not events on
+# different connections. While a story (an ordering key) has requests in
+# flight, its next ones therefore go out on the same connection.
+class SocketIOTransport(ChatTransport):
+    title = "WebSocket"
+    server = "NestJS server"
+    queues_offline = True
+
+    def __init__(
+        self,
+        url=NESTJS_WEBSOCKET_URL,
+        size=WS_POOL_SIZE,
+        reply_timeout=WS_REPLY_TIMEOUT,
+        outbox_size=WS_OUTBOX_SIZE,
+        serializer=WS_SERIALIZER,
+    ):
+        self.url = url
+        if serializer not in ("json", "msgpack"):
+            raise ValueError(f"Unknown WS_SERIALIZER {serializer!r}, expected json or msgpack")
+        # python-socketio calls its JSON packet format "default"
+        self.serializer = "default" if serializer == "json" else serializer
+        self.reply_timeout = reply_timeout
+        self.outbox_size = outbox_size
+        self.lock = threading.Lock()
+        # Serializes emits, so the outbox is flushed in order
+        self.send_lock = threading.Lock()
+        self.clients = [self._create_client(i) for i in range(size)]
+        self.next_index = itertools.count()
+        self.pending = {}  # correlationId -> PendingReply
+        # correlationIds in emit order per connection, used when a reply
+        # comes back without a correlationId
+        self.in_flight = [collections.deque() for _ in range(size)]
+        self.outbox = collections.deque()  # correlationIds waiting for a connection
+        # ordering key -> [connection index, requests in flight there]; a key
+        # is present while any of its requests is in flight
+        self.pinned = {}
+        self.reconnect_thread = None
+        self.reconnect_wakeup = threading.Event()
+        self.reconnecting = False
+
+    def _create_client(self, index):
+        # Reconnection is left to the shared reconnect thread (see _reconnect_loop)
+        sio = socketio.Client(reconnection=False, serializer=self.serializer)
+
+        @sio.event
+        def connect():
+            logger.info("Connection %s connected", index)
+
+        @sio.event
+        def disconnect(*args):
+            logger.info("Connection %s disconnected", index)
+            # Replies to requests sent on this connection will not arrive there
+            self._requeue_in_flight(index)
+            self.reconnect_wakeup.set()
+
+        @sio.event
+        def connect_error(data):
+            logger.warning("Connection %s failed: %s", index, data)
+
+        @sio.on('messageReply')
+        def on_create_chat(data):
+            logger.debug("Received messageReply: %s", data)
+            pending = self._pop_pending(index, data.get('correlationId'))
+            if pending is None:
+                logger.warning("Dropping messageReply with no pending request: %s", data)
+                return
+            BACKEND_RTT_SECONDS.observe(time.perf_counter() - pending.sent_at)
+            try:
+                pending.future.set_result(data)
+            except concurrent.futures.InvalidStateError:
+                pass  # cancelled or timed out in the meantime
+
+        @sio.on('messageChunk')
+        def on_message_chunk(data):
+            # Partial reply text; the final messageReply still follows
+            with self.lock:
+                pending = self.pending.get(self._correlation_id(index, data.get('correlationId')))
+            if pending is None or pending.on_chunk is None:
+                return
+            pending.chunked = True
+            try:
+                pending.on_chunk(data.get('name', 'assistant'), data.get('delta', ''))
+            except TurnCancelled:
+                pass  # the final messageReply is dropped with the cancelled future
+
+        return sio
+
+    # --- Connection management ---
+    def connect(self):
+        # Called on every rerun. Connecting is left to one reconnect thread, so
+        # sessions rerunning during an outage do not each start an attempt.
+        with self.lock:
+            if self.reconnect_thread is None:
+                self.reconnecting = True
+                self.reconnect_thread = threading.Thread(
+                    target=self._reconnect_loop, name="socketio-reconnect", daemon=True
+                )
+                self.reconnect_thread.start()
+        return any(client.connected for client in self.clients)
+
+    def is_connecting(self):
+        return self.reconnecting
+
+    def _reconnect_loop(self):
+        # Brings every dropped connection back, one at a time, with jittered
+        # exponential backoff between rounds shared by the whole pool
+        rounds = 0
+        while True:
+            # The only thread that reconnects: it must outlive any error
+            try:
+                down = [i for i, client in enumerate(self.clients) if not client.connected]
+                if not down:
+                    rounds = 0
+                    self.reconnecting = False
+                    self.reconnect_wakeup.wait()
+                    self.reconnect_wakeup.clear()
+                    continue
+                self.reconnecting = True
+                for index in down:
+                    try:
+                        self.clients[index].connect(self.url)
+                    except Exception as e:
+                        logger.debug("Connection %s failed to connect: %s", index, e)  # connect_error logged it
+                        break  # the backend is likely down for the others too
+                    self._flush_outbox()
+                if any(not client.connected for client in self.clients):
+                    delay = random.uniform(0, min(WS_RECONNECT_DELAY_MAX, WS_RECONNECT_DELAY * 2 ** rounds))
+                    rounds += 1
+                    logger.info("Reconnecting in %.1fs", delay)
+                    time.sleep(delay)
+            except Exception:
+                logger.exception("Reconnect round failed")
+                time.sleep(WS_RECONNECT_DELAY)
+
+    # --- Requests ---
+    def emit(self, message, future, on_chunk=None, story_id="STRY1", order_key=None):
+        # The reply resolves `future`; with `on_chunk`, the reply is streamed
+        # and every messageChunk is passed to it first. Emits with the same
+        # `order_key` reach the backend in order.
+        correlation_id = uuid.uuid4().hex
+        payload = {"storyId": story_id, "message": message, "correlationId": correlation_id}
+        if on_chunk is not None:
+            payload["stream"] = True
+        with self.lock:
+            if len(self.outbox) >= self.outbox_size:
+                raise ConnectionError(f"Not connected to the Socket.IO backend; {len(self.outbox)} messages already waiting")
+            self.pending[correlation_id] = PendingReply(future, on_chunk, payload, order_key)
+            self.outbox.append(correlation_id)
+        # Drop the route (or the queued emit) as soon as the caller gives up on the reply
+        future.add_done_callback(lambda f: self._discard(correlation_id))
+        self._flush_outbox()
+        return correlation_id
+
+    def _flush_outbox(self):
+        # Sends queued emits in order over the connected clients
+        with self.send_lock:
+            while True:
+                connected = [i for i, client in enumerate(self.clients) if client.connected]
+                with self.lock:
+                    if not connected:
+                        return
+                    next_emit = self._next_emit(connected)
+                    if next_emit is None:
+                        return
+                    correlation_id, pending, index = next_emit
+                    self.outbox.remove(correlation_id)
+                    pending.index = index
+                    pending.sent_at = time.perf_counter()
+                    self.in_flight[index].append(correlation_id)
+                    if pending.order_key is not None:
+                        self.pinned.setdefault(pending.order_key, [index, 0])[1] += 1
+                try:
+                    self.clients[index].emit('createChat', pending.payload)
+                except Exception as e:
+                    logger.warning("Emit on connection %s failed, keeping it queued: %s", index, e)
+                    with self.lock:
+                        # Unless the disconnect handler has already requeued it
+                        # (or the caller gave up on it) in the meantime
+                        if pending.index == index and correlation_id in self.in_flight[index]:
+                            self._remove_in_flight(correlation_id, pending)
+                            pending.index = None
+                            self.outbox.appendleft(correlation_id)
+                    return
+
+    def _next_emit(self, connected):
+        # (correlationId, PendingReply, connection) of the oldest queued emit
+        # that can go out now. An emit pinned to a connection that dropped waits
+        # until the disconnect handler requeues its key's earlier requests.
+        for correlation_id in self.outbox:
+            pending = self.pending[correlation_id]
+            pin = self.pinned.get(pending.order_key)
+            if pin is None:
+                return correlation_id, pending, connected[next(self.next_index) % len(connected)]
+            if pin[0] in connected:
+                return correlation_id, pending, pin[0]
+        return None
+
+    def _remove_in_flight(self, correlation_id, pending):
+        self.in_flight[pending.index].remove(correlation_id)
+        pin = self.pinned.get(pending.order_key)
+        if pin is not None:
+            pin[1] -= 1
+            if not pin[1]:
+                del self.pinned[pending.order_key]
+
+    def fetch_reply(self, message, story_id="STRY1"):
+        # Blocking request/reply over a pooled connection (used for option prefetch)
+        future = concurrent.futures.Future()
+        self.emit(message, future, story_id=story_id)
+        try:
+            return future.result(timeout=self.reply_timeout)
+        finally:
+            future.cancel()
+
+    def fetch_streamed_reply(self, message, on_chunk, story_id="STRY1"):
+        future = concurrent.futures.Future()
+        self.emit(message, future, on_chunk, story_id)
+        try:
+            return future.result(timeout=self.reply_timeout)
+        finally:
+            future.cancel()
+
+    def start_turn(self, dispatcher, message, cache_key=None, story_id="STRY1", order_key=None):
+        # Replies arrive on the Socket.IO threads, so no worker waits for them.
+        # Turns with the same `order_key` share a connection while in flight.
+        turn = dispatcher.track(message, cache_key, timeout=self.reply_timeout)
+        try:
+            self.emit(message, turn.future, turn.add_chunk if STREAM_RESPONSES else None, story_id, order_key)
+        except Exception as e:
+            turn.future.set_exception(e)
+        return turn
+
+    def _correlation_id(self, index, correlation_id):
+        if correlation_id is None and self.in_flight[index]:
+            return self.in_flight[index][0]
+        return correlation_id
+
+    def _pop_pending(self, index, correlation_id):
+        with self.lock:
+            correlation_id = self._correlation_id(index, correlation_id)
+            pending = self.pending.pop(correlation_id, None)
+            if pending is not None and pending.index is not None:
+                self._remove_in_flight(correlation_id, pending)
+            elif pending is not None:
+                self.outbox.remove(correlation_id)  # requeued, answered anyway
+            return pending
+
+    def _discard(self, correlation_id):
+        with self.lock:
+            pending = self.pending.pop(correlation_id, None)
+            if pending is None:
+                return
+            if pending.index is not None:
+                self._remove_in_flight(correlation_id, pending)
+            else:
+                self.outbox.remove(correlation_id)
+
+    def _requeue_in_flight(self, index):
+        # Requests sent on a dropped connection are sent again after reconnect,
+        # ahead of newer ones; a streamed reply that already showed text fails
+        # instead, since resending it would repeat that text
+        failed = []
+        with self.lock:
+            requeued = []
+            for correlation_id in list(self.in_flight[index]):
+                pending = self.pending[correlation_id]
+                self._remove_in_flight(correlation_id, pending)
+                if pending.chunked:
+                    failed.append(self.pending.pop(correlation_id))
+                    continue
+                pending.index = None
+                pending.payload["resume"] = True
+                requeued.append(correlation_id)
+            self.outbox.extendleft(reversed(requeued))
+        for pending in failed:
+            try:
+                pending.future.set_exception(ConnectionError("Socket.IO connection lost while the reply was streaming"))
+            except concurrent.futures.InvalidStateError:
+                pass
+
+    def error_message(self, error):
+        return f"Error sending message: {error}. Connection lost?"
+
+
+def create_transport():
+    return SocketIOTransport()
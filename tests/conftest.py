@@ -0,0 +1,35 @@
+"""Runs tests against the mock backend from benchmarks/mock_backend.py."""
+import json
+import os
+import socket
+import sys
+import urllib.request
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+from harness import start_mock_backend, stop_processes  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def mock_backend():
+    """start(*mock_args) -> base URL of a fresh mock backend, stopped after the module."""
+    procs = []
+
+    def start(*args):
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            port = s.getsockname()[1]
+        procs.append(start_mock_backend(port, *args))
+        return f"http://127.0.0.1:{port}"
+
+    yield start
+    stop_processes(*procs)
+
+
+def replies_built(base_url):
+    """Replies the mock backend at `base_url` has built so far."""
+    with urllib.request.urlopen(f"{base_url}/__stats") as response:
+        return json.load(response)["replies"]
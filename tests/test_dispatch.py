@@ -0,0 +1,113 @@
+"""TurnDispatcher: per-key ordering, double submits, cancellation and admission."""
+import threading
+import time
+
+import pytest
+
+from common.dispatch import DispatcherBusy, TurnDispatcher
+
+
+def blocking_fn(started, release, calls):
+    """A backend call that records its message and waits for `release`."""
+
+    def fn(message, on_chunk):
+        calls.append(message)
+        started.set()
+        release.wait(5)
+        return {"message": message}
+
+    return fn
+
+
+def wait_until(predicate, timeout=5):
+    # Done callbacks and the key's bookkeeping run just after the result is set
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.005)
+
+
+def test_same_key_turns_run_in_submission_order():
+    dispatcher = TurnDispatcher(max_workers=4, max_pending=10)
+    running = []
+    log = []
+
+    def fn(message, on_chunk):
+        running.append(message)
+        log.append((message, len(running)))
+        time.sleep(0.01)
+        running.remove(message)
+        return message
+
+    turns = [dispatcher.submit(fn, f"m{i}", key="s:A") for i in range(5)]
+    assert [turn.future.result(5) for turn in turns] == [f"m{i}" for i in range(5)]
+    # In order, and never two of the key's turns at once
+    assert log == [(f"m{i}", 1) for i in range(5)]
+
+
+def test_other_keys_run_alongside():
+    dispatcher = TurnDispatcher(max_workers=2, max_pending=10)
+    started, release, calls = threading.Event(), threading.Event(), []
+    blocked = dispatcher.submit(blocking_fn(started, release, calls), "a1", key="s:A")
+    assert started.wait(5)
+    other = dispatcher.submit(lambda message, on_chunk: message, "b1", key="s:B")
+    assert other.future.result(5) == "b1"
+    release.set()
+    assert blocked.future.result(5) == {"message": "a1"}
+
+
+def test_cancelled_queued_turn_is_skipped_and_frees_its_slot():
+    dispatcher = TurnDispatcher(max_workers=2, max_pending=2)
+    started, release, calls = threading.Event(), threading.Event(), []
+    fn = blocking_fn(started, release, calls)
+    first = dispatcher.submit(fn, "first", key="s:A")
+    assert started.wait(5)
+    queued = dispatcher.submit(fn, "queued", key="s:A")
+    with pytest.raises(DispatcherBusy):
+        dispatcher.submit(fn, "over", key="s:B")
+
+    queued.cancel()
+    assert dispatcher.pending == 1
+    after = dispatcher.submit(fn, "after", key="s:A")  # the freed slot
+    release.set()
+    assert after.future.result(5) == {"message": "after"}
+    assert first.future.result(5) == {"message": "first"}
+    assert calls == ["first", "after"]
+    wait_until(lambda: dispatcher.pending == 0 and not dispatcher.waiting and not dispatcher.latest)
+
+
+def test_duplicate_returns_the_turn_in_flight():
+    dispatcher = TurnDispatcher(max_workers=2, max_pending=10)
+    started, release, calls = threading.Event(), threading.Event(), []
+    fn = blocking_fn(started, release, calls)
+    turn = dispatcher.submit(fn, "hello", key="s:A")
+    assert started.wait(5)
+
+    assert dispatcher.submit(fn, "hello", key="s:A") is turn
+    assert dispatcher.submit(fn, "hello", key="s:B") is not turn  # another story
+    assert dispatcher.pending == 2
+    release.set()
+    turn.future.result(5)
+    wait_until(lambda: "s:A" not in dispatcher.latest)
+
+    # Once the reply is in, the same message is a new turn
+    again = dispatcher.submit(fn, "hello", key="s:A")
+    assert again is not turn
+    again.future.result(5)
+    assert calls.count("hello") == 3
+
+
+def test_busy_at_max_pending():
+    dispatcher = TurnDispatcher(max_workers=1, max_pending=2)
+    started, release, calls = threading.Event(), threading.Event(), []
+    fn = blocking_fn(started, release, calls)
+    turns = [dispatcher.submit(fn, f"m{i}") for i in range(2)]
+    with pytest.raises(DispatcherBusy):
+        dispatcher.submit(fn, "m2")
+    with pytest.raises(DispatcherBusy):
+        dispatcher.track("m2")
+    release.set()
+    for turn in turns:
+        turn.future.result(5)
+    wait_until(lambda: dispatcher.pending == 0)
+    dispatcher.submit(fn, "m2").future.result(5)
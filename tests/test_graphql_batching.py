@@ -0,0 +1,64 @@
+"""GraphQL array batching against the mock backend (benchmarks/mock_backend.py)."""
+import asyncio
+
+from conftest import replies_built
+from gql import Client, GraphQLRequest, gql
+from gql.transport.exceptions import TransportQueryError
+from gql.transport.httpx import HTTPXAsyncTransport
+from graphql import GraphQLError
+
+from common.transports.graphql_transport import CHAT_MUTATION, GraphQLBatcher, PersistentGraphQLSession
+
+# Fails on the server: `message` must be a String
+INVALID_MUTATION = gql(
+    """
+    mutation { createChat(input: { storyId: "STRY1", message: 1 }) { answers { name message } } }
+    """
+)
+
+
+def test_failed_operation_does_not_rerun_the_batch(mock_backend):
+    backend_url = mock_backend()
+
+    async def run():
+        # No schema, so the invalid operation reaches the server
+        session = PersistentGraphQLSession(Client(transport=HTTPXAsyncTransport(url=f"{backend_url}/graphql")))
+        batcher = GraphQLBatcher(session, window=0.05, max_size=10)
+        requests = [
+            GraphQLRequest(CHAT_MUTATION, variable_values={"storyId": "STRY1", "message": f"m{i}"}) for i in range(3)
+        ] + [GraphQLRequest(INVALID_MUTATION)]
+        try:
+            return await asyncio.gather(*(batcher.execute(r) for r in requests), return_exceptions=True)
+        finally:
+            await session.reset()
+
+    before = replies_built(backend_url)
+    outcomes = asyncio.run(run())
+
+    assert [o["createChat"]["answers"][0]["message"] for o in outcomes[:3]] == [f"You said: m{i}" for i in range(3)]
+    assert isinstance(outcomes[3], TransportQueryError)
+    # One execution per valid operation, none repeated
+    assert replies_built(backend_url) - before == 3
+
+
+def test_operation_failing_validation_is_left_out_of_the_batch(mock_backend):
+    backend_url = mock_backend()
+
+    async def run():
+        client = Client(transport=HTTPXAsyncTransport(url=f"{backend_url}/graphql"), fetch_schema_from_transport=True)
+        session = PersistentGraphQLSession(client)
+        batcher = GraphQLBatcher(session, window=0.05, max_size=10)
+        requests = [
+            GraphQLRequest(CHAT_MUTATION, variable_values={"storyId": "STRY1", "message": f"m{i}"}) for i in range(2)
+        ] + [GraphQLRequest(INVALID_MUTATION)]
+        try:
+            return await asyncio.gather(*(batcher.execute(r) for r in requests), return_exceptions=True)
+        finally:
+            await session.reset()
+
+    before = replies_built(backend_url)
+    outcomes = asyncio.run(run())
+
+    assert [o["createChat"]["answers"][0]["message"] for o in outcomes[:2]] == ["You said: m0", "You said: m1"]
+    assert isinstance(outcomes[2], GraphQLError)
+    assert replies_built(backend_url) - before == 2
@@ -0,0 +1,33 @@
+"""Automatic Persisted Queries against servers with APQ on and off."""
+from conftest import replies_built
+
+from common.transports import graphql_transport
+from common.transports.graphql_transport import GraphQLTransport
+
+
+def create_transport(base_url, monkeypatch):
+    # Introspect the mock instead of reading or writing the on-disk schema cache
+    monkeypatch.setattr(graphql_transport, "load_client_schema", lambda url: (None, None))
+    return GraphQLTransport(url=f"{base_url}/graphql", persisted_queries=True)
+
+
+def test_unknown_hash_is_registered_once(mock_backend, monkeypatch):
+    base_url = mock_backend()
+    transport = create_transport(base_url, monkeypatch)
+    before = replies_built(base_url)
+
+    assert transport.fetch_reply("first")["answers"][0]["message"] == "You said: first"
+    assert transport.fetch_reply("second")["answers"][0]["message"] == "You said: second"
+    assert transport.persisted_queries
+    assert replies_built(base_url) - before == 2
+
+
+def test_server_without_apq_gets_plain_queries(mock_backend, monkeypatch):
+    base_url = mock_backend("--no-persisted-queries")
+    transport = create_transport(base_url, monkeypatch)
+    before = replies_built(base_url)
+
+    assert transport.fetch_reply("first")["answers"][0]["message"] == "You said: first"
+    assert not transport.persisted_queries
+    assert transport.fetch_reply("second")["answers"][0]["message"] == "You said: second"
+    assert replies_built(base_url) - before == 2
@@ -0,0 +1,33 @@
+"""What the rate limit on log lines lets through."""
+import logging
+
+from common.logs import RateLimitFilter
+
+
+def passed(limiter, level, msg, *args):
+    record = logging.LogRecord("chat.test", level, __file__, 1, msg, args, None)
+    return limiter.filter(record), record.getMessage()
+
+
+def test_debug_lines_are_limited_per_template():
+    limiter = RateLimitFilter(interval=60)
+    assert passed(limiter, logging.DEBUG, "Rendering answer options: %s", ["a"])[0]
+    assert not passed(limiter, logging.DEBUG, "Rendering answer options: %s", ["b"])[0]
+
+
+def test_distinct_info_and_warning_lines_all_pass():
+    limiter = RateLimitFilter(interval=60)
+    for session, error in (("s1", "timeout"), ("s2", "503"), ("s3", "refused")):
+        assert passed(limiter, logging.WARNING, "Request for '%s' failed: %s", session, error)[0]
+    assert passed(limiter, logging.INFO, "Connection %s connected", 0)[0]
+    assert passed(limiter, logging.INFO, "Connection %s connected", 1)[0]
+
+
+def test_identical_lines_are_limited_and_counted():
+    limiter = RateLimitFilter(interval=60)
+    assert passed(limiter, logging.WARNING, "Connection %s failed: %s", 0, "refused")[0]
+    assert not passed(limiter, logging.WARNING, "Connection %s failed: %s", 0, "refused")[0]
+    limiter.last = {key: [entry[0] - limiter.interval, entry[1]] for key, entry in limiter.last.items()}  # interval elapsed
+    assert passed(limiter, logging.WARNING, "Connection %s failed: %s", 0, "refused") == (
+        True, "Connection 0 failed: refused (1 similar suppressed)",
+    )
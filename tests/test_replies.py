@@ -0,0 +1,49 @@
+"""Malformed answers are dropped, whichever decoder reads the reply."""
+import json
+import logging
+
+import pytest
+
+from common.conversation_store import ChatMessage
+from common.replies import DECODERS, parse_reply
+
+BODY = {
+    "answers": [
+        {"name": "bot", "message": "first"},
+        {"name": 5, "message": "bad name"},
+        {"name": "bot", "message": ["bad message"]},
+        "not an answer",
+        {"name": None, "message": "second"},
+    ],
+    "answerOptions": {"isNeeded": True, "options": ["yes", "no"]},
+}
+
+
+def available_decoders():
+    params = []
+    for name, create in DECODERS.items():
+        try:
+            params.append(pytest.param(create(), id=name))
+        except ImportError:
+            params.append(pytest.param(None, id=name, marks=pytest.mark.skip(reason=f"{name} is not installed")))
+    return params
+
+
+@pytest.mark.parametrize("decode", available_decoders())
+def test_decoders_drop_malformed_answers(decode, caplog):
+    with caplog.at_level(logging.WARNING, logger="common.replies"):
+        messages, options = parse_reply(decode(json.dumps(BODY).encode()))
+
+    assert messages == [ChatMessage("bot", "first"), ChatMessage("assistant", "second")]
+    assert options == ["yes", "no"]
+    [record] = caplog.records
+    assert record.malformed_answers == 3
+
+
+def test_parse_reply_drops_malformed_answers(caplog):
+    with caplog.at_level(logging.WARNING, logger="common.replies"):
+        messages, _ = parse_reply(BODY)
+
+    assert messages == [ChatMessage("bot", "first"), ChatMessage("assistant", "second")]
+    [record] = caplog.records
+    assert record.malformed_answers == 3
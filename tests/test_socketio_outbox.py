@@ -0,0 +1,67 @@
+"""Socket.IO outbox bookkeeping: per-story connections and drops during an emit."""
+import concurrent.futures
+
+from common.transports.socketio_transport import SocketIOTransport
+
+
+def connected_transport(size):
+    """A transport whose clients record their emits instead of sending them."""
+    transport = SocketIOTransport(url="http://127.0.0.1:9", size=size)
+    sent = []
+    for index, client in enumerate(transport.clients):
+        client.connected = True
+        client.emit = lambda event, payload, index=index: sent.append((index, payload["message"]))
+    return transport, sent
+
+
+def test_emit_failing_after_disconnect_requeues_once():
+    transport = SocketIOTransport(url="http://127.0.0.1:9", size=1)
+    client = transport.clients[0]
+    client.connected = True
+
+    def emit_on_dropped_connection(event, payload):
+        # The disconnect handler runs first and requeues what was in flight
+        client.connected = False
+        transport._requeue_in_flight(0)
+        raise ConnectionError("connection dropped")
+
+    client.emit = emit_on_dropped_connection
+    correlation_id = transport.emit("hello", concurrent.futures.Future())
+
+    assert list(transport.outbox) == [correlation_id]
+    assert not transport.in_flight[0]
+    assert transport.pending[correlation_id].index is None
+
+
+def test_story_stays_on_one_connection_while_in_flight():
+    transport, sent = connected_transport(2)
+    first = transport.emit("a1", concurrent.futures.Future(), order_key="s:A")
+    transport.emit("b1", concurrent.futures.Future(), order_key="s:B")
+    transport.emit("a2", concurrent.futures.Future(), order_key="s:A")
+    transport.emit("a3", concurrent.futures.Future(), order_key="s:A")
+
+    on = dict((message, index) for index, message in sent)
+    assert on["a1"] == on["a2"] == on["a3"] != on["b1"]
+
+    # Once every reply of a story is in, it is free to use any connection
+    for correlation_id in list(transport.in_flight[on["a1"]]):
+        transport._pop_pending(on["a1"], correlation_id)
+    assert "s:A" not in transport.pinned and "s:B" in transport.pinned
+    assert first not in transport.pending
+
+
+def test_story_waits_for_its_dropped_connection_to_be_requeued():
+    transport, sent = connected_transport(2)
+    transport.emit("a1", concurrent.futures.Future(), order_key="s:A")
+    [(index, _)] = sent
+    transport.clients[index].connected = False  # disconnect handler not run yet
+
+    transport.emit("a2", concurrent.futures.Future(), order_key="s:A")
+    transport.emit("b1", concurrent.futures.Future(), order_key="s:B")
+    assert [message for _, message in sent] == ["a1", "b1"]
+
+    # The disconnect handler puts a1 back ahead of a2; both go out in order
+    transport._requeue_in_flight(index)
+    transport._flush_outbox()
+    assert [message for _, message in sent] == ["a1", "b1", "a1", "a2"]
+    assert sent[-1][0] == sent[-2][0] == 1 - index